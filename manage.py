@@ -1,9 +1,12 @@
 import os
+import sys
 import subprocess
 import click
+from collections import Counter
 
 root_dir = os.path.abspath(os.path.dirname(__file__))
 path = os.path.join(root_dir, 'projects/main.py')
+sys.path.insert(0, os.path.join(root_dir, 'projects'))
 
 @click.group()
 def cli():
@@ -17,5 +20,153 @@ def run():
     click.echo(f"Running {path}...")
     subprocess.run(['python', path], check=True, cwd=root_dir)
 
+@cli.command()
+@click.argument('steps', nargs=-1)
+@click.option('--workers', default=None, type=int, help='并行的进程数，默认为CPU核数；为1时依次运行')
+@click.option('--list', 'list_steps', is_flag=True, help='只列出步骤及其依赖，不运行')
+@click.option('--rebuild', is_flag=True, help='忽略步骤缓存，全部重新运行')
+@click.option('--no-cache', is_flag=True, help='不读取也不写入步骤缓存')
+def pipeline(steps, workers, list_steps, rebuild, no_cache):
+    """按依赖关系并行运行数据处理步骤，不指定步骤时运行全部步骤"""
+    # 各步骤中的数据路径相对于项目根目录
+    os.chdir(root_dir)
+    import main
+    from lib.step_cache import step_cache
+    flow = main.build_pipeline()
+    if list_steps:
+        dependencies = flow.dependencies()
+        for name in flow.order():
+            step = flow.steps[name]
+            after = f"  (依赖: {', '.join(dependencies[name])})" if dependencies[name] else ''
+            click.echo(f"{name}: {', '.join(map(str, step.outputs))}{after}")
+        return
+    try:
+        flow.run(list(steps) or None, workers=workers, cache=None if no_cache else step_cache, rebuild=rebuild)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+@cli.group()
+def cache():
+    """管理Excel sheet的列式缓存"""
+    pass
+
+@cache.command()
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--sheet', 'sheets', multiple=True, help='只缓存指定的sheet，可以重复传入')
+def warm(files, sheets):
+    """解析工作簿并写入缓存"""
+    from lib.sheet_cache import sheet_cache
+    if not sheet_cache.enabled:
+        raise click.ClickException("pyarrow 未安装，无法使用列式缓存")
+    for file in files:
+        warmed = sheet_cache.warm(file, list(sheets) or None)
+        click.echo(f"{file}: 已缓存 {len(warmed)} 个sheet {warmed}")
+
+@cache.command()
+def info():
+    """列出缓存中的sheet"""
+    from lib.sheet_cache import sheet_cache
+    entries = sheet_cache.entries()
+    click.echo(f"缓存目录: {sheet_cache.cache_dir}")
+    for entry in entries:
+        status = '过期' if entry['stale'] else '有效'
+        click.echo(f"[{status}] {entry['source']} :: {entry['sheet']} "
+                   f"({entry['columns']} 列, {entry['size'] / 1024:.1f} KB)")
+    click.echo(f"共 {len(entries)} 个缓存sheet，"
+               f"{sum(entry['size'] for entry in entries) / 1024 / 1024:.2f} MB")
+
+@cache.command()
+@click.argument('files', nargs=-1, type=click.Path(dir_okay=False))
+@click.option('--stale-only', is_flag=True, help='只删除来源文件已变化或已删除的缓存')
+def purge(files, stale_only):
+    """删除缓存"""
+    from lib.sheet_cache import sheet_cache
+    targets = list(files) or [None]
+    removed = sum(sheet_cache.purge(file, stale_only=stale_only) for file in targets)
+    click.echo(f"已删除 {removed} 个缓存文件")
+
+@cli.group()
+def land():
+    """土地出让数据的县域汇总与区县报告"""
+    pass
+
+@land.command()
+@click.argument('files', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', default=None, type=click.Path(file_okay=False),
+              help='数据集目录，默认为 projects/data/土地出让')
+@click.option('--append', is_flag=True, help='追加到已有数据集（例如新的年度数据），默认重新生成')
+@click.option('--chunksize', default=200_000, show_default=True, help='读取CSV时每个分块的行数')
+def ingest(files, output, append, chunksize):
+    """将土地出让交易CSV转换为按 省/年份 分区的Parquet数据集"""
+    from lib.land import ingest_land_csv, DEFAULT_LAND_DATASET
+    try:
+        rows = ingest_land_csv(list(files), output or DEFAULT_LAND_DATASET, append=append, chunksize=chunksize)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"已写入 {rows} 条交易记录到 {output or DEFAULT_LAND_DATASET}")
+
+def land_source(input_path):
+    """--input 为目录时读取Parquet数据集，为文件时读取CSV，未指定时优先使用默认数据集"""
+    from lib.land import open_land_source
+    if input_path is None:
+        return open_land_source()
+    if os.path.isdir(input_path):
+        return open_land_source(None, dataset_root=input_path)
+    return open_land_source(input_path, dataset_root=None)
+
+@land.command('build-cube')
+@click.option('--input', 'input_path', default=None, type=click.Path(exists=True),
+              help='交易数据CSV或Parquet数据集目录，默认优先使用 projects/data/土地出让 数据集')
+def build_cube(input_path):
+    """从交易明细构建县域汇总立方体并写入缓存"""
+    from lib.land import CountyCube
+    cube = CountyCube.cached(land_source(input_path), rebuild=True)
+    click.echo(f"已构建县域汇总立方体: {len(cube.data)} 行, {len(cube.counties())} 个区县")
+
+@land.command()
+@click.argument('counties', nargs=-1)
+@click.option('--city', default=None, help='区县所属城市，县名在多个城市中重复时使用')
+@click.option('--suffix', default=None, help='不指定区县时，为所有以该后缀结尾的区县生成报告，例如 区')
+@click.option('--input', 'input_path', default=None, type=click.Path(exists=True),
+              help='交易数据CSV或Parquet数据集目录，默认优先使用 projects/data/土地出让 数据集')
+@click.option('--output-dir', default=os.path.join(root_dir, 'projects/data'), type=click.Path(file_okay=False),
+              help='报告输出目录')
+@click.option('--with-transactions', is_flag=True, help='同时写入交易明细（原始数据 sheet，需要重新扫描交易数据）')
+def report(counties, city, suffix, input_path, output_dir, with_transactions):
+    """生成区县土地出让报告（与望城区数据.xlsx格式相同）"""
+    from lib.land import CountyCube, filter_city, write_district_workbook
+    source = land_source(input_path)
+    cube = CountyCube.cached(source)
+
+    if counties:
+        targets = [(county, city) for county in counties]
+    elif suffix:
+        listing = cube.counties()
+        listing = listing[listing['县'].str.endswith(suffix)]
+        targets = list(zip(listing['县'], listing['市']))
+    else:
+        raise click.UsageError("请指定区县名称，或使用 --suffix 批量生成")
+
+    # 批量生成时县名重复的区县在文件名中加上城市名
+    repeats = Counter(county for county, _ in targets)
+    os.makedirs(output_dir, exist_ok=True)
+    for county, county_city in targets:
+        try:
+            district = cube.district_report(county, county_city)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if not district:
+            click.echo(f"未找到 {county} 的数据")
+            continue
+        prefix = f"{county_city}{county}" if repeats[county] > 1 else county
+        output_file = os.path.join(output_dir, f"{prefix}数据.xlsx")
+        transactions = None
+        if with_transactions:
+            transactions = source.read(county=county)
+            if county_city is not None:
+                transactions = filter_city(transactions, county_city)
+        write_district_workbook(district, output_file, transactions=transactions)
+        click.echo(f"{prefix}: {output_file}")
+
 if __name__ == '__main__':
-    cli()
\ No newline at end of file
+    cli()
@@ -1,3 +1,6 @@
 from lib.cleaner import *
 from lib.tools import *
-from lib.reader import *
\ No newline at end of file
+from lib.reader import *
+from lib.workbook import *
+from lib.panel import *
+from lib.city_index import *
\ No newline at end of file
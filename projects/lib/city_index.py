@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Optional
+
+# 行政区划名称的后缀，较长的后缀优先匹配
+CITY_SUFFIXES = ('自治州', '地区', '市', '盟')
+
+# 历史更名与常见别称：旧名 -> const.py 中的城市名
+CITY_ALIASES: Dict[str, str] = {
+    '襄樊': '襄阳',      # 2010年更名
+    '思茅': '普洱',      # 2007年更名
+    '淮阴': '淮安',      # 2001年更名
+    '荆沙': '荆州',      # 1996年更名
+    '伊克昭盟': '鄂尔多斯',  # 2001年撤盟设市
+    '哲里木盟': '通辽',   # 1999年撤盟设市
+    '昭乌达盟': '赤峰',   # 1983年撤盟设市
+    '达县': '达州',      # 1999年撤地设市（原达县地区）
+}
+
+
+class CityIndex:
+    """
+    城市名称的规范化索引
+
+    以 const.py 中的城市列表为标准名称，每个城市对应一个整数ID（在列表中的位置）。
+    原始名称先去掉首尾空白，再依次尝试：直接匹配、别称/历史更名、去掉一个
+    市/地区/盟/自治州 后缀后匹配。整列查找时只对去重后的名称做一次字符串处理，
+    再按编码批量映射。
+
+    参数:
+        cities (Iterable): 标准城市名称列表
+        aliases (dict): 别称到标准名称的映射，默认为 CITY_ALIASES
+    """
+    def __init__(self, cities: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.cities = pd.Index(list(cities))
+        if not self.cities.is_unique:
+            raise ValueError("城市列表中存在重复的城市")
+        self._lookup: Dict[str, int] = {city: i for i, city in enumerate(self.cities)}
+        for alias, city in (CITY_ALIASES if aliases is None else aliases).items():
+            if city in self._lookup:
+                self._lookup.setdefault(alias, self._lookup[city])
+
+    def resolve(self, name: Hashable) -> int:
+        """
+        返回单个名称对应的城市ID，无法匹配时返回 -1
+
+        参数:
+            name: 原始城市名称
+
+        返回:
+            int: 城市ID
+        """
+        if not isinstance(name, str):
+            return -1
+        name = name.strip()
+        if name in self._lookup:
+            return self._lookup[name]
+        for suffix in CITY_SUFFIXES:
+            if name.endswith(suffix) and len(name) > len(suffix) + 1:
+                base = name[:-len(suffix)]
+                if base in self._lookup:
+                    return self._lookup[base]
+        return -1
+
+    def canonical(self, name: Hashable) -> Hashable:
+        """
+        返回单个名称的标准名称；无法匹配时去掉名称中的"市"，与 clean_column_data(col, '市') 一致
+
+        参数:
+            name: 原始城市名称
+
+        返回:
+            标准名称，非字符串原样返回
+        """
+        city_id = self.resolve(name)
+        if city_id >= 0:
+            return self.cities[city_id]
+        return name.replace('市', '') if isinstance(name, str) else name
+
+    def codes(self, values) -> np.ndarray:
+        """
+        将整列名称映射为城市ID
+
+        参数:
+            values: 城市名称列
+
+        返回:
+            np.ndarray: 城市ID，缺失或无法匹配的为 -1
+        """
+        codes, uniques = pd.factorize(pd.Series(values))
+        ids = np.fromiter((self.resolve(name) for name in uniques), dtype=np.intp, count=len(uniques))
+        return np.where(codes >= 0, ids[np.maximum(codes, 0)], -1)
+
+    def unmatched(self, values) -> List[Hashable]:
+        """返回列中无法匹配的名称（去重，按出现顺序）"""
+        uniques = pd.unique(pd.Series(values).dropna())
+        return [name for name in uniques if self.resolve(name) < 0]
+
+    def categorical(self, values) -> pd.Categorical:
+        """
+        将整列名称转换为以标准城市列表为类别的 Categorical，无法匹配的为缺失值
+        """
+        return pd.Categorical.from_codes(self.codes(values), categories=self.cities)
+
+    def normalize(self, values, label: str = '城市') -> pd.Series:
+        """
+        将整列名称替换为标准名称，并一次性报告无法匹配的名称
+
+        无法匹配的名称只去掉"市"（与原来的 clean_column_data(col, '市') 相同），
+        不会变成缺失值，由后续的样本筛选决定是否保留。
+
+        参数:
+            values (pd.Series): 城市名称列
+            label (str): 报告中使用的列名
+
+        返回:
+            pd.Series: 规范化后的城市名称，索引与输入相同
+        """
+        series = pd.Series(values)
+        codes, uniques = pd.factorize(series)
+        ids = np.fromiter((self.resolve(name) for name in uniques), dtype=np.intp, count=len(uniques))
+        names = np.empty(len(uniques), dtype=object)
+        names[:] = [self.cities[i] if i >= 0 else self.canonical(name) for name, i in zip(uniques, ids)]
+
+        result = series.astype(object)
+        valid = codes >= 0
+        result[valid] = names[codes[valid]]
+        if isinstance(series.dtype, pd.StringDtype):
+            result = result.astype(series.dtype)
+
+        unmatched = [name for name, i in zip(uniques, ids) if i < 0]
+        if unmatched:
+            print(f"{label} 中有 {len(unmatched)} 个名称不在城市列表中: {unmatched}")
+        return result
+
+
+@lru_cache(maxsize=None)
+def default_city_index() -> CityIndex:
+    """以 Constant.cities 为标准名称的城市索引，进程内只构建一次"""
+    from const import Constant
+    return CityIndex(Constant.cities)
@@ -1,8 +1,14 @@
 import pandas as pd
 from lib.tools import *
+from lib.city_index import CityIndex, default_city_index
+from lib.panel import panel_index
+from lib.interpolation import as_float_array, fit_group_lines, group_codes, nearest_positive
+from lib.workbook import RowFilter, apply_pushdown, resolve_alias, workbook_registry
+from lib.schema import CoercionReport, IngestSchema
+from lib.writer import WriteSession
 from functools import singledispatch
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import numpy as np
 
 @dataclass
@@ -20,7 +26,9 @@ class DataCleaner:
         data: 可以是Excel文件路径或pandas DataFrame
         sheet_name: 如果data是文件路径，则需要指定sheet名称
     """
-    def __init__(self, data, sheet_name: str = None, is_long_format: bool = True, long_format_params: Optional[LongFormatParams] = None):
+    def __init__(self, data, sheet_name: str = None, is_long_format: bool = True, long_format_params: Optional[LongFormatParams] = None,
+                 columns: Optional[List] = None, row_filters: Optional[List[RowFilter]] = None,
+                 write_session: Optional[WriteSession] = None, schema: Optional[IngestSchema] = None):
         """
         初始化数据清洗类
         参数:
@@ -28,7 +36,14 @@ class DataCleaner:
             sheet_name: 如果data是文件路径，则需要指定sheet名称
             is_long_format: 是否需要转换为长格式，默认为True
             long_format_params: 转换为长格式所需的参数
+            columns: 读取时只保留这些列（宽表转换前的原始列名）
+            row_filters: 读取时下推的行过滤条件，不满足条件的行不会被加载
+            write_session: 写入会话，为None时使用该文件当前激活的会话（如果有）
+            schema: 列类型声明，读取后立即按声明转换各列（错误文本转为缺失值），
+                转换统计保存在 coercion_report
         """
+        self.write_session = write_session
+        self.coercion_report: Optional[CoercionReport] = None
         if isinstance(data, str):
             self.file_path = data
             self.sheet_name = sheet_name
@@ -36,15 +51,24 @@ class DataCleaner:
             if sheet_name is None:
                 raise ValueError("sheet_name must be provided when data is a file path")
 
-            # 读取Excel文件
-            excel_file = pd.ExcelFile(self.file_path)
-            
-            # 检查sheet是否存在
-            if self.sheet_name not in excel_file.sheet_names:
-                raise ValueError(f"Sheet '{self.sheet_name}' not found in file")
+            session = self._session()
+            if session is not None and session.has_sheet(self.sheet_name):
+                # 会话中已暂存的sheet以暂存的数据为准
+                self.data = session.read_sheet(self.sheet_name)
+                if columns is not None or row_filters:
+                    self.data = apply_pushdown(self.data, columns, row_filters)
+            else:
+                # 检查sheet是否存在（工作簿在进程内只打开一次）
+                if self.sheet_name not in workbook_registry.sheet_names(self.file_path):
+                    raise ValueError(f"Sheet '{self.sheet_name}' not found in file")
 
-            # 读取数据
-            self.data = pd.read_excel(self.file_path, sheet_name=self.sheet_name)
+                # 读取数据，列投影和行过滤在读取时完成；按schema转换时会生成新的DataFrame，不需要先复制
+                self.data = workbook_registry.read_sheet(
+                    self.file_path, self.sheet_name, copy=schema is None, columns=columns, row_filters=row_filters
+                )
+            if schema is not None:
+                self.data, self.coercion_report = schema.apply(self.data)
+                print(f"{self.sheet_name}: {self.coercion_report.summary()}")
             if not is_long_format and long_format_params:
                 self.data = Tools.panel_to_long(
                     self.data, 
@@ -58,13 +82,23 @@ class DataCleaner:
         else:
             raise ValueError("data must be either a pandas DataFrame or a file path")
 
+    def _session(self, file_path: Optional[str] = None) -> Optional[WriteSession]:
+        if self.write_session is not None:
+            return self.write_session
+        return WriteSession.active_for(self.file_path if file_path is None else file_path)
+
     @timeit
     def replace_column_name(self, column_names: list[str], new_column_name: str):
-        print(self.data.columns)
-        for column_name in column_names:
-            if column_name in self.data.columns:
-                self.data = self.data.rename(columns={column_name: new_column_name}, inplace=True)
-                break
+        """
+        将 column_names 中第一个存在的列重命名为 new_column_name
+
+        参数:
+            column_names (list[str]): 候选列名（别名），如 Constant.CITIES_NAME
+            new_column_name (str): 新列名
+        """
+        column_name = resolve_alias(self.data.columns, column_names)
+        if column_name is not None:
+            self.data = self.data.rename(columns={column_name: new_column_name})
 
     @timeit
     def clean_column_data(self, column_name: str, replace_value: str) -> None:
@@ -77,6 +111,23 @@ class DataCleaner:
         """
         self.data[column_name] = self.data[column_name].str.replace(replace_value, '')
 
+    @timeit
+    def normalize_city_column(self, column_name: str, city_index: Optional[CityIndex] = None) -> None:
+        """
+        将城市名称列统一为 const.py 中的标准城市名称
+
+        去掉市/地区/盟/自治州后缀并处理历史更名（如襄樊 -> 襄阳），无法匹配的
+        名称一次性打印出来，其值只去掉"市"，与 clean_column_data(col, '市') 相同。
+
+        参数:
+            column_name (str): 城市名称列名
+            city_index (CityIndex): 使用的城市索引，默认为以 Constant.cities 构建的索引
+        """
+        if column_name not in self.data.columns:
+            raise ValueError(f"列名 '{column_name}' 不存在")
+        city_index = city_index or default_city_index()
+        self.data[column_name] = city_index.normalize(self.data[column_name], label=column_name)
+
     @timeit
     def clean_data_keep_values(self, column_name: str, keep_values: list) -> None:
         """
@@ -135,78 +186,80 @@ class DataCleaner:
         treat_zeros_as_missing: 是否将0值视为缺失值
         replace_negative_with_nearest_positive: 是否将负值替换为最近年份的正值
         """
+        self.interpolate_many([y_column], id_column, x_column,
+                              treat_zeros_as_missing=treat_zeros_as_missing,
+                              replace_negative_with_nearest_positive=replace_negative_with_nearest_positive)
+
+    @timeit
+    def interpolate_many(self, columns: List[str], id_column: str, x_column: str,
+                         treat_zeros_as_missing: Union[bool, Dict[str, bool]] = False,
+                         replace_negative_with_nearest_positive: Union[bool, Dict[str, bool]] = False) -> None:
+        """
+        一次性对多列缺失数据进行线性回归插值
+
+        分组索引只构建一次，所选列组成一个二维数组，所有 (分组, 列) 的回归在一次
+        批量计算中完成。每一列的结果与单独调用 interpolate_missing_data 相同。
+
+        参数:
+        columns: 需要插值的列名列表
+        id_column: 分组的ID列名（如城市）
+        x_column: 自变量列名（如年份）
+        treat_zeros_as_missing: 是否将0值视为缺失值，可以传入 {列名: bool} 按列指定
+        replace_negative_with_nearest_positive: 是否将负值替换为最近年份的正值，
+            可以传入 {列名: bool} 按列指定
+        """
         # 验证列是否存在
-        required_columns = [y_column, id_column, x_column]
-        for col in required_columns:
+        columns = list(dict.fromkeys(columns))
+        for col in columns + [id_column, x_column]:
             if col not in self.data.columns:
                 raise ValueError(f"列 {col} 不存在于数据中")
         
         # 确保数据类型正确
-        if not pd.api.types.is_numeric_dtype(self.data[y_column]):
-            raise ValueError(f"列 {y_column} 必须是数值类型")
-        
-        # 创建一个副本以避免修改原始数据
-        data = self.data.copy()
-        
-        # 如果需要将0值视为缺失值
-        if treat_zeros_as_missing:
-            # 将y_column中的0值替换为NaN
-            data.loc[data[y_column] == 0, y_column] = np.nan
-        
-        # 获取唯一的分组值（如城市）
-        groups = data[id_column].unique()
-        
-        # 对每个分组进行处理
-        for group in groups:
-            # 获取当前分组的数据
-            group_data = data[data[id_column] == group].copy()
-            
-            # 如果当前分组的数据中y_column没有缺失值，则跳过
-            if not group_data[y_column].isna().any():
-                continue
-            
-            # 获取非缺失值的数据点
-            valid_data = group_data.dropna(subset=[y_column])
-            
-            # 如果非缺失值数据点少于2个，则无法进行线性回归，跳过
-            if len(valid_data) < 2:
-                continue
-            
-            # 准备线性回归的数据
-            X = valid_data[x_column].values
-            y = valid_data[y_column].values
-            
-            # 使用numpy进行线性回归
-            A = np.vstack([X, np.ones(len(X))]).T
-            slope, intercept = np.linalg.lstsq(A, y, rcond=None)[0]
-            
-            # 获取缺失值的索引
-            missing_indices = group_data[group_data[y_column].isna()].index
-            
-            # 对缺失值进行预测
-            for idx in missing_indices:
-                x_val = self.data.loc[idx, x_column]
-                predicted_value = slope * x_val + intercept
-                
-                # 如果需要替换负值为最近年份的正值
-                if replace_negative_with_nearest_positive and predicted_value < 0:
-                    # 获取当前分组中所有正值数据
-                    positive_data = valid_data[valid_data[y_column] > 0]
-                    
-                    if not positive_data.empty:
-                        # 计算年份差异，找到最近的年份
-                        positive_data['year_diff'] = abs(positive_data[x_column] - x_val)
-                        nearest_idx = positive_data['year_diff'].idxmin()
-                        nearest_positive = positive_data.loc[nearest_idx, y_column]
-                        
-                        # 用最近年份的正值替换预测的负值
-                        self.data.loc[idx, y_column] = nearest_positive
-                    else:
-                        # 如果没有正值，则使用0
-                        self.data.loc[idx, y_column] = 0
-                else:
-                    # 将预测值填充到原始数据中
-                    self.data.loc[idx, y_column] = predicted_value
+        for col in columns:
+            if not pd.api.types.is_numeric_dtype(self.data[col]):
+                raise ValueError(f"列 {col} 必须是数值类型")
+        if not columns:
+            return
+
+        def per_column(option, name):
+            if isinstance(option, dict):
+                unknown = set(option) - set(columns)
+                if unknown:
+                    raise ValueError(f"{name} 中的列 {sorted(unknown)} 不在插值列中")
+                return np.array([bool(option.get(col, False)) for col in columns])
+            return np.full(len(columns), bool(option))
+
+        zeros_as_missing = per_column(treat_zeros_as_missing, 'treat_zeros_as_missing')
+        replace_negative = per_column(replace_negative_with_nearest_positive,
+                                      'replace_negative_with_nearest_positive')
+
+        # 所有分组、所有列一次性计算，y 中的 NaN（以及视为缺失的0）不参与回归
+        original = np.column_stack([as_float_array(self.data[col]) for col in columns])
+        y = original.copy()
+        y[(y == 0) & zeros_as_missing] = np.nan
+        x = as_float_array(self.data[x_column])
+        codes, n_groups = group_codes(self.data[id_column])
+        lines = fit_group_lines(codes, n_groups, x, y)
+
+        # 非缺失值数据点少于2个的 (分组, 列) 无法进行线性回归，跳过
+        has_line = np.zeros(y.shape, dtype=bool)
+        grouped = codes >= 0
+        has_line[grouped] = lines.count[codes[grouped]] >= 2
+        rows, cols = np.nonzero(has_line & np.isnan(y))
+        if len(rows) == 0:
+            return
+
+        predicted = lines.predict(codes[rows], x[rows], cols)
+
+        # 如果需要替换负值为最近年份的正值（没有正值时使用0）
+        negative = (predicted < 0) & replace_negative[cols]
+        if negative.any():
+            predicted[negative] = nearest_positive(codes, x, y, rows[negative], cols[negative])
+
+        # 将预测值一次性填充到原始数据中，没有需要填充的列保持原数据类型
+        original[rows, cols] = predicted
+        for j in np.unique(cols):
+            self.data[columns[j]] = original[:, j]
 
     @timeit
     def create_panel_dataset(self, index_columns: list[str], index_values: dict[str, list]) -> None:
@@ -217,35 +270,13 @@ class DataCleaner:
             index_columns (list[str]): 索引列名列表，如 ['地级市', '年份']
             index_values (dict[str, list]): 每个索引列的所有可能值，如 {'地级市': cities, '年份': years}
         """
-        # 保存原始数据（包含改革信息）
-        reform_data = self.data.copy()
-        
-        # 获取列名
         city_col = index_columns[0]  # '地级市'
         year_col = index_columns[1]  # '年份'
-        
-        # 获取城市和年份列表
-        cities = index_values[city_col]
-        years = sorted(index_values[year_col])  # 确保年份排序
-        
-        # 生成完整的面板数据（所有城市和年份的组合）
-        panel_data = []
-        for city in cities:
-            for year in years:
-                panel_data.append({city_col: city, year_col: year})
-        
-        # 转换为DataFrame
-        panel_df = pd.DataFrame(panel_data)
-        
-        # 确保年份列为整数类型
-        panel_df[year_col] = panel_df[year_col].astype(int)
-        if year_col in reform_data.columns:
-            reform_data[year_col] = pd.to_numeric(reform_data[year_col], errors='coerce').astype('Int64')
-        
-        # 合并面板数据和原始数据
-        # 使用left join确保保留所有城市-年份组合，即使在原始数据中不存在
-        self.data = pd.merge(panel_df, reform_data, on=index_columns, how='left')
-        
+
+        # 按整数位置把原始数据对齐到完整的面板（所有城市和年份的组合），
+        # 保留所有城市-年份组合，即使在原始数据中不存在
+        panel = panel_index(index_values[city_col], index_values[year_col])
+        self.data = panel.align(self.data, city_col, year_col)
 
         # 将缺失值填充为0或适当的默认值
         # 对于撤县设区数据，缺失值表示该年份未进行改革，应填充为0
@@ -259,37 +290,27 @@ class DataCleaner:
         - treat: 是否为改革城市（1表示该城市在研究期间发生过改革）
         - obi: 是否为改革后时期（1表示当前年份>=改革年份）
         - did: treat * obi 的乘积
+        - event_year: 改革年份（未改革城市为0）
+        - rel_time: 当前年份与改革年份之差（未改革城市为空）
         
         参数:
             time_col: 时间列名（年份）
             unit_col: 单位列名（地级市）
         """
-        # 初始化变量
-        self.data['treat'] = 0
-        self.data['obi'] = 0
-        self.data['did'] = 0
-        
-        # 获取每个城市的改革时间
-        reform_data = self.data[self.data['省份'].notna()].copy()
-        
-        if not reform_data.empty:
-            # 按城市分组，找出每个城市的改革年份
-            reform_years = reform_data.groupby(unit_col)[time_col].min()
-            
-            # 对每个发生改革的城市
-            for city, reform_year in reform_years.items():
-                # 设置treat=1（表示该城市是改革城市）
-                self.data.loc[self.data[unit_col] == city, 'treat'] = 1
-                
-                # 设置obi=1（表示改革年份及之后的时期）
-                mask = (
-                    (self.data[unit_col] == city) & 
-                    (self.data[time_col] >= reform_year)
-                )
-                self.data.loc[mask, 'obi'] = 1
-                
-                # 计算did（treat和obi的乘积）
-                self.data['did'] = self.data['treat'] * self.data['obi']
+        # 按城市分组，一次找出每个改革城市的改革年份（有省份信息的最早年份）
+        reform_data = self.data[self.data['省份'].notna()]
+        reform_years = reform_data.groupby(unit_col, observed=True)[time_col].min()
+        event_year = self.data[unit_col].astype(object).map(reform_years).astype(float)
+
+        # treat: 改革城市为1；obi: 改革年份及之后为1；did: treat * obi
+        treated = event_year.notna()
+        self.data['treat'] = treated.astype(int)
+        self.data['obi'] = (treated & (self.data[time_col] >= event_year)).astype(int)
+        self.data['did'] = self.data['treat'] * self.data['obi']
+
+        # event_year: 改革年份，未改革城市为0；rel_time: 相对改革年份的期数，未改革城市为空
+        self.data['event_year'] = event_year.fillna(0).astype(int)
+        self.data['rel_time'] = (self.data[time_col] - event_year).where(treated).astype('Int64')
         
         # 使用const.py中的城市顺序进行排序
         from const import Constant
@@ -297,6 +318,66 @@ class DataCleaner:
         self.data[unit_col] = self.data[unit_col].astype(city_order)
         self.data = self.data.sort_values(by=[unit_col, time_col])
 
+    @timeit
+    def create_event_study_dummies(self, time_col: str, event_col: str = 'event_year', did_col: str = 'did',
+                                   leads: int = 13, lags: int = 13, bin_endpoints: bool = False,
+                                   omitted_period: Optional[int] = None) -> List[str]:
+        """
+        生成事件研究（平行趋势检验）所需的相对时间虚拟变量
+        - pre_k: 改革前第k年（action == -k 且 event_year != 0）
+        - current: 改革当年（action == 0 且 event_year != 0）
+        - las_k: 改革后第k年（action == k 且 did == 1）
+        其中 action = 年份 - event_year，与 do 文件中的定义一致。所有虚拟变量由
+        action 的整数运算一次写入一个 int8 矩阵。
+
+        参数:
+            time_col: 时间列名（年份）
+            event_col: 改革年份列名，未改革城市为0（由 create_did_variable 生成）
+            did_col: DID列名，缺失时以 event_year != 0 代替
+            leads: 改革前的期数，默认为13
+            lags: 改革后的期数，默认为13
+            bin_endpoints: 为True时将早于 -leads 的期归入 pre_{leads}，晚于 lags 的期归入 las_{lags}
+            omitted_period: 作为基期不生成的相对期（如 -1 表示不生成 pre_1），默认为None
+
+        返回:
+            list[str]: 生成的虚拟变量列名，按 pre_{leads} ... pre_1, current, las_1 ... las_{lags} 排列
+        """
+        for col in [time_col, event_col]:
+            if col not in self.data.columns:
+                raise ValueError(f"列 {col} 不存在于数据中")
+        if omitted_period is not None and not -leads <= omitted_period <= lags:
+            raise ValueError(f"omitted_period {omitted_period} 不在 [-{leads}, {lags}] 范围内")
+
+        year = as_float_array(self.data[time_col])
+        event_year = as_float_array(self.data[event_col])
+        action = year - event_year
+
+        # 改革前和当年只要求是改革城市，改革后还要求 did == 1
+        treated = ~np.isnan(action) & (event_year != 0)
+        if did_col in self.data.columns:
+            after = as_float_array(self.data[did_col]) == 1
+        else:
+            after = treated
+        eligible = np.where(action > 0, after, treated)
+
+        if bin_endpoints:
+            action = np.clip(action, -leads, lags)
+        eligible &= (action >= -leads) & (action <= lags)
+
+        names = [f"pre_{k}" for k in range(leads, 0, -1)] + ['current'] + [f"las_{k}" for k in range(1, lags + 1)]
+        block = np.zeros((len(action), len(names)), dtype=np.int8)
+        rows = np.flatnonzero(eligible)
+        block[rows, action[rows].astype(int) + leads] = 1
+
+        if omitted_period is not None:
+            keep = np.arange(len(names)) != omitted_period + leads
+            block = block[:, keep]
+            names = [name for name, kept in zip(names, keep) if kept]
+
+        dummies = pd.DataFrame(block, columns=names, index=self.data.index)
+        self.data = pd.concat([self.data.drop(columns=names, errors='ignore'), dummies], axis=1)
+        return names
+
     @timeit
     def replace_values_less_than_one(self, columns: List[str]) -> None:
         """
@@ -322,9 +403,21 @@ class DataCleaner:
                 self.data.loc[mask, column] = 1
                 
     @timeit
-    def close_file_and_save(self):
+    def close_file_and_save(self, file_path: Optional[str] = None):
         """
         将数据写回Excel文件并关闭
+
+        存在写入会话时只暂存数据，由会话统一提交
+
+        参数:
+            file_path (str): 写入的工作簿，默认为读取的工作簿
         """
-        with pd.ExcelWriter(self.file_path, mode='a', if_sheet_exists='replace') as writer:
+        file_path = self.file_path if file_path is None else file_path
+        session = self._session(file_path)
+        if session is not None:
+            session.stage(self.sheet_name, self.data)
+            return
+
+        with pd.ExcelWriter(file_path, mode='a', if_sheet_exists='replace') as writer:
             self.data.to_excel(writer, sheet_name=self.sheet_name, index=False)
+        workbook_registry.invalidate(file_path)
@@ -1,41 +1,94 @@
-import csv
-from typing import List, Dict, Any
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Mapping, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # 只有 compression='zstd' 时需要 zstandard
+    zstandard = None
+
+# 支持的压缩格式及对应的文件后缀
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
 
 class CSVWriter:
     """
-    CSV文件写入类，用于逐行写入CSV文件
-    
+    CSV文件写入类，支持逐行添加后写入，也支持整表批量写入
+
+    逐行添加的数据按列缓存，write() 时一次性转换为 DataFrame 写出，输出与 csv.writer 一致
+    （NaN 写为 "nan"，None 写为空）；write_frame() 直接写出 DataFrame 或 {列名: 数组}，
+    按 block_size 行分块编码写入，缺失值默认写为空。
+
     参数:
         output_file (str): 输出CSV文件路径
+        compression (str): None、'gzip'、'zstd'，或 'infer'（按文件后缀 .gz/.zst 判断）
+        float_format (str): 浮点数格式，例如 '%.6f'；None 时按原值输出
+        block_size (int): 批量写入时每块的行数
     """
-    def __init__(self, output_file: str):
+    def __init__(self, output_file: str, compression: Optional[str] = 'infer',
+                 float_format: Optional[str] = None, block_size: int = 100_000):
+        if compression == 'infer':
+            compression = next((name for name, suffix in COMPRESSION_SUFFIXES.items()
+                                if str(output_file).endswith(suffix)), None)
+        if compression not in (None, *COMPRESSION_SUFFIXES):
+            raise ValueError(f"不支持的压缩格式: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ValueError("compression='zstd' requires zstandard")
         self.output_file = output_file
-        self.data = []
-        self.columns = []
-    
+        self.compression = compression
+        self.float_format = float_format
+        self.block_size = block_size
+        self.columns: List[str] = []
+        self._buffer: Dict[str, List[Any]] = {}
+
     def set_columns(self, columns: List[str]):
         """
         设置CSV文件的列名
-        
+
         参数:
             columns (List[str]): 列名列表
         """
-        self.columns = columns
-    
+        self.columns = list(columns)
+        self._buffer = {col: [] for col in self.columns}
+
     def add_row(self, row: Dict[str, Any]):
         """
         添加一行数据
-        
+
         参数:
-            row (Dict[str, Any]): 行数据字典，键为列名，值为对应的数据
+            row (Dict[str, Any]): 行数据字典，键为列名，值为对应的数据；缺少的列写为空
         """
-        self.data.append([row.get(col, '') for col in self.columns])
-    
+        for col in self.columns:
+            self._buffer[col].append(row.get(col, ''))
+
     def write(self):
         """
-        将数据写入CSV文件
+        将逐行添加的数据写入CSV文件
+        """
+        columns = {}
+        for col, values in self._buffer.items():
+            # csv.writer 把 None 写为空，NaN 写为 "nan"
+            values = ['' if value is None else value for value in values]
+            column = pd.Series(values, dtype=object)
+            # 同一列的值类型一致时转换为对应的数值类型（float_format 只作用于浮点列）；
+            # 类型混合的列保持逐个值原样输出，例如 1 和 2.5 混合时 1 仍写为 "1"
+            if len({type(value) for value in values}) == 1:
+                column = column.infer_objects()
+            columns[col] = column
+        self.write_frame(pd.DataFrame(columns, columns=self.columns), na_rep='nan')
+
+    def write_frame(self, data: Union[pd.DataFrame, Mapping[str, np.ndarray]], na_rep: str = ''):
+        """
+        将整表数据一次写入CSV文件
+
+        参数:
+            data: DataFrame，或 {列名: 数组} 形式的列数据；已调用 set_columns 时
+                按其中的列和顺序输出
+            na_rep (str): 缺失值的写法，默认为空
         """
-        with open(self.output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(self.columns)
-            writer.writerows(self.data)
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(dict(data))
+        if self.columns:
+            frame = frame.reindex(columns=self.columns)
+        # 换行符与 csv.writer 的默认格式一致
+        frame.to_csv(self.output_file, index=False, encoding='utf-8', lineterminator='\r\n',
+                     na_rep=na_rep, float_format=self.float_format, chunksize=self.block_size,
+                     compression=self.compression)
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+from typing import NamedTuple, Tuple
+
+
+class GroupLines(NamedTuple):
+    """
+    每个 (分组, 列) 的线性回归结果 y = slope * (x - x_origin) + intercept
+
+    slope、intercept、count 的形状均为 (分组数, 列数)；x 在求和前平移了
+    x_origin（全体有效点的均值），避免年份平方和的精度损失。
+    """
+    slope: np.ndarray
+    intercept: np.ndarray
+    count: np.ndarray
+    x_origin: float
+
+    def predict(self, codes: np.ndarray, x: np.ndarray, columns=0) -> np.ndarray:
+        return self.slope[codes, columns] * (x - self.x_origin) + self.intercept[codes, columns]
+
+
+def as_float_array(series: pd.Series) -> np.ndarray:
+    """
+    将数值列（包括可空整数、以数值为类别的Categorical）转换为float64数组，缺失值为NaN
+
+    返回的数组总是新的副本，可以直接修改。
+    """
+    return np.array(series.to_numpy(dtype=float, na_value=np.nan), dtype=float, copy=True)
+
+
+def group_codes(series: pd.Series) -> Tuple[np.ndarray, int]:
+    """
+    将分组列编码为整数
+
+    返回:
+        (codes, n_groups)：codes 中缺失的分组为 -1
+    """
+    codes, uniques = pd.factorize(series)
+    return codes, len(uniques)
+
+
+def fit_group_lines(codes: np.ndarray, n_groups: int, x: np.ndarray, y: np.ndarray) -> GroupLines:
+    """
+    用分组求和的闭式解一次性计算所有 (分组, 列) 的最小二乘直线
+
+    y 可以是一维数组，也可以是 (行数, 列数) 的二维数组；所有列共用同一个分组
+    索引，(分组, 列) 被展平为一个编号后只需一组 np.bincount 即可累计 n、Σx、Σy、
+    Σxy、Σx²。斜率和截距由闭式公式得到，结果与逐组调用 np.linalg.lstsq 一致；
+    组内所有 x 相同（设计矩阵奇异）时取 lstsq 给出的最小范数解。
+
+    参数:
+        codes (np.ndarray): 每行的分组编码，-1 表示不属于任何分组
+        n_groups (int): 分组数量
+        x (np.ndarray): 自变量（如年份）
+        y (np.ndarray): 因变量，NaN 表示缺失
+
+    返回:
+        GroupLines: 各 (分组, 列) 的斜率、截距和有效点数量
+    """
+    block = y.reshape(len(y), -1)
+    n_columns = block.shape[1]
+    size = n_groups * n_columns
+
+    valid = ((codes >= 0) & ~np.isnan(x))[:, None] & ~np.isnan(block)
+    rows, columns = np.nonzero(valid)
+    slot = codes[rows] * n_columns + columns
+    xv = x[rows]
+    yv = block[rows, columns]
+
+    grouped_x = x[(codes >= 0) & ~np.isnan(x)]
+    x_origin = float(grouped_x.mean()) if len(grouped_x) else 0.0
+    xs = xv - x_origin
+
+    n = np.bincount(slot, minlength=size).astype(float)
+    sx = np.bincount(slot, weights=xs, minlength=size)
+    sy = np.bincount(slot, weights=yv, minlength=size)
+    sxy = np.bincount(slot, weights=xs * yv, minlength=size)
+    sxx = np.bincount(slot, weights=xs * xs, minlength=size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+
+        # 组内 x 全部相同时，lstsq 返回 [x, 1] 方向上的最小范数解
+        x_min = np.full(size, np.inf)
+        x_max = np.full(size, -np.inf)
+        np.minimum.at(x_min, slot, xv)
+        np.maximum.at(x_max, slot, xv)
+        flat = (n >= 2) & (x_min == x_max)
+        if flat.any():
+            c = x_min[flat]
+            y_mean = sy[flat] / n[flat]
+            flat_slope = c * y_mean / (c * c + 1)
+            slope[flat] = flat_slope
+            intercept[flat] = y_mean / (c * c + 1) + flat_slope * x_origin
+
+    shape = (n_groups, n_columns)
+    return GroupLines(slope=slope.reshape(shape), intercept=intercept.reshape(shape),
+                      count=n.astype(int).reshape(shape), x_origin=x_origin)
+
+
+def nearest_positive(codes: np.ndarray, x: np.ndarray, y: np.ndarray,
+                     rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """
+    对每个 (rows[i], columns[i]) 单元格，返回同组同列中 x 距离最近的正值观测；
+    组内没有正值时返回0
+
+    行按 (分组, x) 排序后，用前向/后向累积最大最小值一次求出每个单元格之前和
+    之后最近的正值位置，所有列同时处理。前后距离相同时取 x 较小（较早年份）的
+    观测，结果与行的原始顺序无关。
+
+    参数:
+        codes (np.ndarray): 分组编码
+        x (np.ndarray): 自变量
+        y (np.ndarray): 因变量，(行数, 列数)，NaN 表示缺失
+        rows (np.ndarray): 需要查找的行位置
+        columns (np.ndarray): 需要查找的列位置
+
+    返回:
+        np.ndarray: 与 rows 对应的替换值
+    """
+    n_rows = len(codes)
+    order = np.lexsort((x, codes))
+    position = np.empty(n_rows, dtype=np.intp)
+    position[order] = np.arange(n_rows)
+
+    sorted_codes = codes[order]
+    sorted_x = x[order]
+    positive = (y[order] > 0) & (sorted_codes >= 0)[:, None]
+    steps = np.arange(n_rows)[:, None]
+
+    # 排序后每个单元格之前（含）最近的正值位置，以及之后（含）最近的正值位置
+    before = np.maximum.accumulate(np.where(positive, steps, -1), axis=0)
+    after = np.minimum.accumulate(np.where(positive, steps, n_rows)[::-1], axis=0)[::-1]
+
+    target = position[rows]
+    prev = before[target, columns]
+    next_ = after[target, columns]
+    group = sorted_codes[target]
+    has_prev = prev >= 0
+    has_prev[has_prev] = sorted_codes[prev[has_prev]] == group[has_prev]
+    has_next = next_ < n_rows
+    has_next[has_next] = sorted_codes[next_[has_next]] == group[has_next]
+
+    x_target = x[rows]
+    distance_prev = np.full(len(rows), np.inf)
+    distance_next = np.full(len(rows), np.inf)
+    distance_prev[has_prev] = x_target[has_prev] - sorted_x[prev[has_prev]]
+    distance_next[has_next] = sorted_x[next_[has_next]] - x_target[has_next]
+    distance_prev[np.isnan(distance_prev)] = np.inf
+    distance_next[np.isnan(distance_next)] = np.inf
+
+    use_prev = has_prev & (distance_prev <= distance_next)
+    use_next = has_next & ~use_prev
+    sorted_y = y[order]
+    result = np.zeros(len(rows), dtype=float)
+    result[use_prev] = sorted_y[prev[use_prev], columns[use_prev]]
+    result[use_next] = sorted_y[next_[use_next], columns[use_next]]
+    return result
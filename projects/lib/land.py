@@ -0,0 +1,894 @@
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Union
+from lib.taxonomy import INDUSTRY_TAXONOMY
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+except ImportError:  # 只有Parquet数据集和持久化县域汇总立方体需要 pyarrow
+    pa = pc = ds = feather = None
+
+# 以 Categorical 读取的文本列（取值重复度高，按类别编码存储）
+LAND_CATEGORY_COLUMNS = ('省', '市', '县', '供地方式', '行业分类', '土地来源', '土地用途')
+
+# 面积和价格列
+LAND_VALUE_COLUMNS = ('供地面积_公顷', '成交价格_万元')
+
+# 土地出让交易数据的默认路径
+DEFAULT_LAND_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '土地出让true.csv'
+)
+
+# 按 省/年份 分区的Parquet数据集的默认目录（由 ingest_land_csv 生成）
+DEFAULT_LAND_DATASET = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '土地出让'
+)
+
+DEFAULT_CUBE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '.land_cube'
+)
+
+# Parquet数据集的分区列，以及记录交易在原始CSV中序号的列
+PARTITION_COLUMNS = ('省', '年份')
+ROW_NUMBER_COLUMN = '行号'
+
+# 数据集schema元数据中记录原始CSV列顺序的键
+_META_COLUMNS = b'land.columns'
+
+# 区县报告中的行业汇总类别（定义见 lib/taxonomy.py）
+REPORT_INDUSTRIES = ['制造业', '房地产业', '高科技产业', '生产性服务业', '消费性服务业']
+
+
+class LandTransactionReader:
+    """
+    土地出让交易CSV的分块读取
+
+    按 chunksize 行分块读取，只解析需要的列，文本列按 Categorical、面积和价格按
+    value_dtype 读取；年份范围和县名称等筛选条件在每个分块读入后立即执行，
+    调用方只接触筛选后的行，内存占用与文件大小无关。
+
+    参数:
+        file_path (str): CSV文件路径
+        chunksize (int): 每个分块的行数
+        value_dtype (str): 面积和价格列的类型。默认 float64；float32 可以减半内存，
+            但只有约7位有效数字，以万元计的成交价格求和后会损失精度
+        encoding (str): 文件编码，默认由 pandas 决定
+    """
+    def __init__(self, file_path: str, chunksize: int = 200_000,
+                 value_dtype: str = 'float64', encoding: Optional[str] = None):
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.value_dtype = value_dtype
+        self.encoding = encoding
+
+    def columns(self) -> List[str]:
+        """只读取表头，返回文件中的列名"""
+        return pd.read_csv(self.file_path, nrows=0, encoding=self.encoding).columns.tolist()
+
+    def fingerprint(self) -> str:
+        """文件内容的哈希，用于判断由它构建的缓存是否过期"""
+        from lib.sheet_cache import sheet_cache
+        return sheet_cache.file_digest(self.file_path)
+
+    def infer_dtypes(self) -> Dict[str, str]:
+        """
+        扫描整个文件，为没有固定类型的列确定统一的类型
+
+        各分块分别推断类型，汇总后：任一分块为文本的列为 'str'，否则有浮点的列为
+        'float64'，全部为整数的列为 'int64'，结果与一次性读取整个文件相同。
+
+        返回:
+            dict[str, str]: 列名 -> 类型，可以作为 chunks 的 dtypes 参数
+        """
+        kinds: Dict[str, set] = {}
+        for chunk in self.chunks():
+            for col in chunk.columns:
+                kinds.setdefault(col, set()).add(chunk[col].dtype.kind if chunk[col].dtype.kind in 'ifb' else 'O')
+        fixed = set(LAND_CATEGORY_COLUMNS) | set(LAND_VALUE_COLUMNS) | {'年份'}
+        result = {}
+        for col, found in kinds.items():
+            if col in fixed:
+                continue
+            if 'O' in found or ('b' in found and len(found) > 1):
+                result[col] = 'str'
+            elif 'f' in found:
+                result[col] = 'float64'
+            elif 'i' in found:
+                result[col] = 'int64'
+            else:
+                result[col] = 'bool'
+        return result
+
+    def chunks(self, columns: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None,
+               county_suffix: Optional[str] = None, county: Optional[str] = None,
+               dtypes: Optional[Dict[str, str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        逐块返回筛选后的数据
+
+        参数:
+            columns (Iterable[str]): 需要读取的列，None 表示全部列；筛选用到的列会自动加入
+            years (Iterable[int]): 只保留这些年份
+            county_suffix (str): 只保留 县 以该后缀结尾的行（县为空的行被丢弃）
+            county (str): 只保留 县 等于该名称的行
+            dtypes (dict): 指定列的类型，覆盖自动推断，例如 {'编号': 'str'}
+
+        返回:
+            Iterator[pd.DataFrame]: 筛选后的分块（可能为空），索引为行在文件中的序号，
+                年份没有缺失时为整数
+        """
+        header = self.columns()
+        if columns is None:
+            usecols = header
+        else:
+            usecols = list(dict.fromkeys(columns))
+            if years is not None:
+                usecols.append('年份')
+            if county_suffix is not None or county is not None:
+                usecols.append('县')
+            usecols = list(dict.fromkeys(usecols))
+            missing = [col for col in usecols if col not in header]
+            if missing:
+                raise ValueError(f"列 {missing} 不存在于 {self.file_path} 中")
+
+        dtype: Dict[str, str] = {col: 'category' for col in LAND_CATEGORY_COLUMNS if col in usecols}
+        dtype.update({col: self.value_dtype for col in LAND_VALUE_COLUMNS if col in usecols})
+        if '年份' in usecols:
+            dtype['年份'] = 'float64'
+        dtype.update({col: value for col, value in (dtypes or {}).items() if col in usecols})
+        year_values = None if years is None else np.array(sorted(int(year) for year in years), dtype=float)
+
+        reader = pd.read_csv(self.file_path, usecols=usecols, dtype=dtype,
+                             chunksize=self.chunksize, encoding=self.encoding)
+        for chunk in reader:
+            mask = np.ones(len(chunk), dtype=bool)
+            if year_values is not None:
+                mask &= np.isin(chunk['年份'].to_numpy(), year_values)
+            if county_suffix is not None or county is not None:
+                # 条件只在类别上计算一次，再按编码映射到每一行
+                counties = chunk['县'].cat.categories.astype(str)
+                keep = np.ones(len(counties), dtype=bool)
+                if county_suffix is not None:
+                    keep &= counties.str.endswith(county_suffix)
+                if county is not None:
+                    keep &= counties == county
+                codes = chunk['县'].cat.codes.to_numpy()
+                mask &= (codes >= 0) & keep[np.maximum(codes, 0)]
+
+            chunk = chunk[mask]
+            if '年份' in chunk.columns and chunk['年份'].notna().all():
+                chunk = chunk.astype({'年份': np.int64})
+            yield chunk
+
+    def read(self, columns: Optional[Iterable[str]] = None, **filters) -> pd.DataFrame:
+        """
+        读取筛选后的全部行（适合筛选后数据量较小的情况，例如单个区县）
+
+        参数与 chunks 相同。
+        """
+        parts = list(self.chunks(columns, **filters))
+        if not parts:
+            return pd.DataFrame()
+
+        data = pd.concat(parts, ignore_index=True)
+
+        # 类型由各分块分别推断：同一列在有的分块中是数值、有的分块中是文本时，
+        # 只对这些列再按文本读取一遍（保留编号等字段的前导0），与一次性读取整个文件一致
+        mixed = [col for col in data.columns
+                 if len({pd.api.types.is_numeric_dtype(part[col]) for part in parts}) > 1]
+        if mixed:
+            text = pd.concat(list(self.chunks(mixed, dtypes=dict.fromkeys(mixed, 'str'), **filters)),
+                             ignore_index=True)
+            data[mixed] = text[mixed]
+
+        # 各分块的类别不同，合并后统一为 Categorical
+        for col in LAND_CATEGORY_COLUMNS:
+            if col in data.columns and not isinstance(data[col].dtype, pd.CategoricalDtype):
+                data[col] = data[col].astype('category')
+        return data
+
+
+class LandDataset:
+    """
+    按 省/年份 分区（Hive 目录格式）的土地出让Parquet数据集
+
+    接口与 LandTransactionReader 相同。年份和省份条件只打开对应的分区目录，
+    县名条件借助行组统计跳过不相关的行组，只读取需要的列；文本类别列以字典编码
+    存储，读出后为 Categorical。分块的索引为交易在原始CSV中的序号。
+
+    参数:
+        root (str): 数据集目录
+        batch_size (int): 每个分块的最大行数
+    """
+    def __init__(self, root: str = DEFAULT_LAND_DATASET, batch_size: int = 200_000):
+        if ds is None:
+            raise ValueError("读取Parquet数据集需要 pyarrow")
+        self.root = root
+        self.batch_size = batch_size
+
+    @staticmethod
+    def exists(root: str) -> bool:
+        """目录中是否已有数据集文件"""
+        return os.path.isdir(root) and any(
+            name.endswith('.parquet') for _, _, names in os.walk(root) for name in names
+        )
+
+    def _dataset(self):
+        partitioning = ds.partitioning(pa.schema([('省', pa.string()), ('年份', pa.int64())]), flavor='hive')
+        return ds.dataset(self.root, format='parquet', partitioning=partitioning)
+
+    def columns(self) -> List[str]:
+        """返回原始CSV中的列名（按原始顺序）"""
+        schema = self._dataset().schema
+        metadata = schema.metadata or {}
+        if _META_COLUMNS in metadata:
+            return json.loads(metadata[_META_COLUMNS].decode('utf-8'))
+        return [name for name in schema.names if name != ROW_NUMBER_COLUMN]
+
+    def fingerprint(self) -> str:
+        """数据集所有文件的 (路径, 大小, 修改时间) 的哈希，用于判断由它构建的缓存是否过期"""
+        sha = hashlib.sha256()
+        for directory, _, names in sorted(os.walk(self.root)):
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                sha.update(f"{os.path.relpath(path, self.root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+        return sha.hexdigest()
+
+    def chunks(self, columns: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None,
+               county_suffix: Optional[str] = None, county: Optional[str] = None,
+               provinces: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        逐块返回筛选后的数据
+
+        参数:
+            columns (Iterable[str]): 需要读取的列，None 表示全部列；筛选用到的列会自动加入
+            years (Iterable[int]): 只读取这些年份的分区
+            county_suffix (str): 只保留 县 以该后缀结尾的行
+            county (str): 只保留 县 等于该名称的行
+            provinces (Iterable[str]): 只读取这些省份的分区
+
+        返回:
+            Iterator[pd.DataFrame]: 筛选后的分块，索引为交易在原始CSV中的序号，
+                年份没有缺失时为整数
+        """
+        dataset = self._dataset()
+        names = self.columns()
+        if columns is None:
+            columns = names
+        else:
+            # 与 LandTransactionReader 相同，筛选用到的列也会返回
+            columns = list(columns)
+            if years is not None:
+                columns.append('年份')
+            if provinces is not None:
+                columns.append('省')
+            if county_suffix is not None or county is not None:
+                columns.append('县')
+            columns = list(dict.fromkeys(columns))
+            missing = [col for col in columns if col not in names]
+            if missing:
+                raise ValueError(f"列 {missing} 不存在于 {self.root} 中")
+
+        conditions = []
+        if years is not None:
+            conditions.append(ds.field('年份').isin([int(year) for year in years]))
+        if provinces is not None:
+            conditions.append(ds.field('省').isin(list(provinces)))
+        if county is not None:
+            conditions.append(ds.field('县') == county)
+        if county_suffix is not None:
+            conditions.append(pc.ends_with(ds.field('县').cast(pa.string()), pattern=county_suffix))
+        condition = None
+        for item in conditions:
+            condition = item if condition is None else condition & item
+
+        for table in self._merged_batches(dataset.to_batches(columns=[ROW_NUMBER_COLUMN] + columns,
+                                                             filter=condition, batch_size=self.batch_size)):
+            chunk = table.to_pandas().set_index(ROW_NUMBER_COLUMN)
+            chunk.index.name = None
+            if '省' in chunk.columns:
+                chunk['省'] = chunk['省'].astype('category')
+            if '年份' in chunk.columns:
+                years_column = chunk['年份'].astype('float64')
+                chunk['年份'] = years_column.astype(np.int64) if years_column.notna().all() else years_column
+            yield chunk
+
+    def _merged_batches(self, batches) -> Iterator:
+        """
+        把记录批次合并为不超过 batch_size 行的表
+
+        每个分区文件至少返回一个批次，按县名或年份筛选后批次通常很小；
+        合并后再转换为 DataFrame，分块数量只取决于总行数。
+        """
+        buffer, rows, merged = [], 0, False
+        for batch in batches:
+            if batch.num_rows == 0 and buffer:
+                continue
+            if rows and rows + batch.num_rows > self.batch_size:
+                yield pa.Table.from_batches(buffer)
+                buffer, rows, merged = [], 0, True
+            if buffer and buffer[-1].num_rows == 0:
+                buffer = []
+            buffer.append(batch)
+            rows += batch.num_rows
+        # 所有行都被筛掉时仍返回一个空表，保留列名和类型
+        if buffer and (rows or not merged):
+            yield pa.Table.from_batches(buffer)
+
+    def read(self, columns: Optional[Iterable[str]] = None, **filters) -> pd.DataFrame:
+        """
+        读取筛选后的全部行，按原始CSV中的顺序排列
+
+        参数与 chunks 相同。
+        """
+        parts = list(self.chunks(columns, **filters))
+        if not parts:
+            return pd.DataFrame()
+        data = pd.concat(parts).sort_index().reset_index(drop=True)
+        for col in LAND_CATEGORY_COLUMNS:
+            if col in data.columns and not isinstance(data[col].dtype, pd.CategoricalDtype):
+                data[col] = data[col].astype('category')
+        return data
+
+
+def ingest_land_csv(files: Union[str, Iterable[str]], root: str = DEFAULT_LAND_DATASET,
+                    append: bool = False, chunksize: int = 200_000,
+                    row_group_size: int = 64_000) -> int:
+    """
+    将土地出让交易CSV转换为按 省/年份 分区的Parquet数据集
+
+    每个文件先扫描一遍确定各列的统一类型（见 LandTransactionReader.infer_dtypes），
+    再分块写入：类别列为字典编码，每个分区内按 市、县 排序后写入，使行组统计
+    （每个行组的最小/最大值）能够按县名跳过行组；交易在原始CSV中的序号写入
+    行号 列，读取时恢复原始顺序。
+
+    参数:
+        files: CSV文件路径，或多个文件（例如按年份提供的增量数据）
+        root (str): 数据集目录
+        append (bool): 为False时先清空已有数据集；为True时追加，行号接在已有数据之后
+        chunksize (int): 读取CSV时每个分块的行数
+        row_group_size (int): 每个行组的最大行数
+
+    返回:
+        int: 写入的行数
+    """
+    if ds is None:
+        raise ValueError("生成Parquet数据集需要 pyarrow")
+    files = [files] if isinstance(files, str) else list(files)
+
+    offset = 0
+    if os.path.isdir(root):
+        if append:
+            if LandDataset.exists(root):
+                numbers = LandDataset(root)._dataset().to_table(columns=[ROW_NUMBER_COLUMN]).column(0)
+                offset = int(pc.max(numbers).as_py()) + 1
+        else:
+            # 只清空确实是数据集的目录，避免误删其他文件
+            others = [name for _, _, names in os.walk(root) for name in names if not name.endswith('.parquet')]
+            if others:
+                raise ValueError(f"{root} 中有非Parquet文件 {others[:5]}，不能作为数据集目录清空")
+            shutil.rmtree(root)
+
+    partitioning = ds.partitioning(pa.schema([('省', pa.string()), ('年份', pa.int64())]), flavor='hive')
+    file_options = ds.ParquetFileFormat().make_write_options(compression='zstd', write_statistics=True)
+    written = 0
+    for file_path in files:
+        reader = LandTransactionReader(file_path, chunksize=chunksize)
+        header = reader.columns()
+        missing = [col for col in PARTITION_COLUMNS if col not in header]
+        if missing:
+            raise ValueError(f"{file_path} 缺少分区列 {missing}")
+        dtypes = reader.infer_dtypes()
+        last_row = -1
+
+        def frames():
+            nonlocal last_row
+            for chunk in reader.chunks(dtypes=dtypes):
+                if len(chunk):
+                    last_row = int(chunk.index.max())
+                frame = chunk.assign(**{ROW_NUMBER_COLUMN: chunk.index.to_numpy() + offset})
+                frame['省'] = frame['省'].astype(object).where(frame['省'].notna(), None)
+                frame['年份'] = frame['年份'].astype('Int64')
+                sort_columns = [col for col in ['省', '年份', '市', '县'] if col in frame.columns]
+                yield frame.sort_values(sort_columns, na_position='last')[[ROW_NUMBER_COLUMN] + header]
+
+        batches = frames()
+        first = next(batches, None)
+        if first is None:
+            continue
+        # 以第一个分块确定schema，类别列统一为 dictionary<int32, string>，之后的分块按它转换
+        schema = pa.Schema.from_pandas(first, preserve_index=False)
+        for i, field in enumerate(schema):
+            if pa.types.is_dictionary(field.type):
+                schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), pa.string())))
+            elif field.name == '省':
+                schema = schema.set(i, field.with_type(pa.string()))
+        schema = schema.with_metadata({_META_COLUMNS: json.dumps(header, ensure_ascii=False).encode('utf-8')})
+
+        def record_batches():
+            nonlocal written
+            for frame in itertools.chain([first], batches):
+                written += len(frame)
+                yield from pa.Table.from_pandas(frame, schema=schema, preserve_index=False).to_batches()
+
+        ds.write_dataset(
+            record_batches(), root, schema=schema, format='parquet', partitioning=partitioning,
+            basename_template=f"part-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore', file_options=file_options,
+            max_rows_per_group=row_group_size, min_rows_per_group=min(row_group_size, chunksize),
+        )
+        offset += last_row + 1
+    return written
+
+
+def open_land_source(file_path: Optional[str] = DEFAULT_LAND_FILE,
+                     dataset_root: Optional[str] = DEFAULT_LAND_DATASET):
+    """
+    返回土地出让交易数据的读取器：dataset_root 已生成Parquet数据集（且 pyarrow 可用）时
+    读取数据集，否则分块读取CSV
+
+    参数:
+        file_path (str): 交易数据CSV路径
+        dataset_root (str): Parquet数据集目录，为None时总是读取CSV
+
+    返回:
+        LandDataset 或 LandTransactionReader
+    """
+    if dataset_root is not None and ds is not None and LandDataset.exists(dataset_root):
+        return LandDataset(dataset_root)
+    if file_path is None:
+        raise ValueError(f"Parquet数据集 {dataset_root} 不存在，且没有指定CSV文件")
+    return LandTransactionReader(file_path)
+
+
+def filter_city(data: pd.DataFrame, city: str) -> pd.DataFrame:
+    """
+    只保留属于指定城市的行，城市名按标准城市名比较（可以带或不带"市"）
+
+    参数:
+        data (pd.DataFrame): 包含 市 列的交易数据或汇总行
+        city (str): 城市名称
+
+    返回:
+        pd.DataFrame: 属于该城市的行
+    """
+    from lib.city_index import default_city_index
+    city_index = default_city_index()
+    same_city = data['市'].astype(object).map(city_index.canonical) == city_index.canonical(city)
+    return data[same_city.to_numpy()]
+
+
+# 精确求和时把浮点数拆成以 2**_LIMB_BITS 为基的整数分段；最小的次正规数为 2**-1074，
+# frexp 的尾数乘以 2**53 后为整数，所有有限浮点数都是 整数 × 2**(k - _EXPONENT_OFFSET)，k >= 0
+_LIMB_BITS = 32
+_MANTISSA_BITS = 53
+_EXPONENT_OFFSET = 1074 + _MANTISSA_BITS - 1
+
+
+def _exact_limbs(values: np.ndarray) -> tuple:
+    """
+    把浮点数无误差地拆成整数分段：values[i] = sum(limbs[i, j] * 2**(32 * (first + j))) / 2**_EXPONENT_OFFSET
+
+    每个分段的绝对值小于 2**32，按 int64 求和在 2**31 行以内不会溢出，整数求和与顺序无关。
+    缺失值和无穷大记为0（无穷大另外累计）。
+
+    参数:
+        values (np.ndarray): float64 数组
+
+    返回:
+        (np.ndarray, int): 形状为 (行数, 分段数) 的 int64 数组，以及第一个分段的序号
+    """
+    finite = np.isfinite(values)
+    mantissa, exponent = np.frexp(np.where(finite, values, 0.0))
+    digits = np.abs(mantissa * 2.0 ** _MANTISSA_BITS).astype(np.uint64)
+    sign = np.where(mantissa < 0, -1, 1).astype(np.int64)
+    shift = exponent.astype(np.int64) - _MANTISSA_BITS + _EXPONENT_OFFSET
+    nonzero = digits != 0
+    if not nonzero.any():
+        return np.zeros((len(values), 1), dtype=np.int64), 0
+    base = shift // _LIMB_BITS
+    first = int(base[nonzero].min())
+    base[~nonzero] = first
+    offset = (shift % _LIMB_BITS).astype(np.uint64)
+
+    # 尾数不超过53位，左移 offset（小于32）位后最多跨3个分段
+    one, width = np.uint64(1), np.uint64(_LIMB_BITS)
+    mask = (one << width) - one
+    low = (digits & ((one << (width - offset)) - one)) << offset
+    rest = digits >> (width - offset)
+    columns = base - first
+    limbs = np.zeros((len(values), int(columns.max()) + 3), dtype=np.int64)
+    rows = np.arange(len(values))
+    limbs[rows, columns] = sign * low.astype(np.int64)
+    limbs[rows, columns + 1] = sign * (rest & mask).astype(np.int64)
+    limbs[rows, columns + 2] = sign * (rest >> width).astype(np.int64)
+    return limbs, first
+
+
+def _limbs_to_float(limbs: np.ndarray, first: int) -> np.ndarray:
+    """
+    把 _exact_limbs 的分段之和（每行一个精确的和）转换为正确舍入（就近取偶）的浮点数
+
+    先在整个 (行数, 分段数) 矩阵上逐段进位，使每个分段都在 [0, 2**32) 内、符号只在最高段，
+    再取每行最高的64位按就近取偶舍入到53位，更低的位只影响是否恰好为一半。
+
+    参数:
+        limbs (np.ndarray): 形状为 (行数, 分段数) 的 int64 数组，第 j 段的权重为 2**(32 * (first + j))
+        first (int): 第一个分段的序号
+
+    返回:
+        np.ndarray: 每行的和，float64
+    """
+    count = len(limbs)
+    # 低端补两段，保证最高段以下总有两段；高端补两段存放进位
+    matrix = np.zeros((count, limbs.shape[1] + 4), dtype=np.int64)
+    matrix[:, 2:-2] = limbs
+    first -= 2
+
+    mask = (1 << _LIMB_BITS) - 1
+
+    def carry(matrix):
+        for j in range(matrix.shape[1] - 1):
+            matrix[:, j + 1] += matrix[:, j] >> _LIMB_BITS
+            matrix[:, j] &= mask
+
+    carry(matrix)
+    # 进位后最高段为负即整个和为负，取绝对值后重新进位
+    negative = matrix[:, -1] < 0
+    if negative.any():
+        matrix[negative] = -matrix[negative]
+        carry(matrix)
+
+    digits = matrix.view(np.uint64)
+    nonzero = digits != 0
+    rows = np.arange(count)
+    top = matrix.shape[1] - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    top = np.maximum(top, 2)
+    leading = digits[rows, top]
+    # 最高段的位数（1..32），全为0的行记为1，结果为0
+    bits = np.maximum(np.frexp(leading.astype(np.float64))[1], 1).astype(np.uint64)
+
+    # 最高的64位：最高段左对齐，后面接下一段和再下一段的高位
+    width = np.uint64(_LIMB_BITS)
+    head = (leading << (np.uint64(64) - bits)) | (digits[rows, top - 1] << (width - bits)) \
+        | (digits[rows, top - 2] >> bits)
+    below = np.logical_or.accumulate(nonzero, axis=1)
+    sticky = ((digits[rows, top - 2] & ((np.uint64(1) << bits) - np.uint64(1))) != 0) \
+        | ((top >= 3) & below[rows, np.maximum(top - 3, 0)])
+
+    # 就近取偶舍入到53位
+    drop = np.uint64(64 - _MANTISSA_BITS)
+    mantissa = head >> drop
+    rest = head & ((np.uint64(1) << drop) - np.uint64(1))
+    half = np.uint64(1) << (drop - np.uint64(1))
+    round_up = (rest > half) | ((rest == half) & (sticky | ((mantissa & np.uint64(1)) == 1)))
+    mantissa = mantissa + round_up.astype(np.uint64)
+
+    exponent = _LIMB_BITS * (first + top) + bits.astype(np.int64) - 64 + int(drop) - _EXPONENT_OFFSET
+    sums = np.ldexp(mantissa.astype(np.float64), exponent)
+    return np.where(negative, -sums, sums)
+
+
+class GroupedSum:
+    """
+    跨分块累计的分组求和
+
+    每个分块先在块内分组求和，块内结果先缓存起来，缓存超过 merge_rows 行时
+    （以及取结果时）才与已有的累计结果合并后按分组键重新求和，累计结果的大小只取决于分组数量。浮点数列按精确的整数分段累计（见 _exact_limbs），
+    最后一次舍入为最接近精确和的浮点数，因此结果与分块的划分和到达顺序无关：
+    从CSV按行分块读取与从Parquet数据集按分区读取得到相同的结果。与一次性
+    DataFrame.groupby(keys, dropna=dropna)[values].sum() 相比，只可能在末位舍入上不同。
+    分块的索引应为行在原始数据中的序号（LandTransactionReader 和 LandDataset 返回的
+    分块都是如此），各分组键取值的首次出现顺序按该序号确定，与分块到达的顺序无关。
+
+    参数:
+        keys (list[str]): 分组键
+        values (list[str]): 求和的列
+        dropna (bool): 为True时分组键中有缺失值的行不参与分组，否则缺失值单独成组
+        merge_rows (int): 缓存的块内结果达到该行数时合并到累计结果中
+    """
+    def __init__(self, keys: List[str], values: List[str], dropna: bool = True, merge_rows: int = 1_000_000):
+        self.keys = list(keys)
+        self.values = list(values)
+        self.dropna = dropna
+        self.merge_rows = merge_rows
+        self._total: Optional[pd.DataFrame] = None
+        # 尚未合并的块内求和结果
+        self._partials: List[pd.DataFrame] = []
+        self._partial_rows = 0
+        # 分组键取值 -> (首次出现的行号, 原始取值)，缺失值统一记在 None 下
+        self._first: Dict[str, Dict[Hashable, tuple]] = {key: {} for key in self.keys}
+        # 各求和列是否出现过非整数类型，只有整数时结果保持整数类型
+        self._floating = [False] * len(self.values)
+
+    @staticmethod
+    def _limb_column(position: int, limb) -> str:
+        return f"__sum{position}:{limb}"
+
+    def add(self, chunk: pd.DataFrame):
+        """累计一个分块"""
+        if len(chunk) == 0:
+            return
+        rows = chunk.index.to_numpy()
+        for key in self.keys:
+            codes, uniques = pd.factorize(chunk[key], use_na_sentinel=False)
+            first = np.full(len(uniques), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(first, codes, rows)
+            seen = self._first[key]
+            for value, row in zip(uniques, first):
+                marker = None if pd.isna(value) else value
+                if marker not in seen or row < seen[marker][0]:
+                    seen[marker] = (row, value)
+
+        # 求和列换成精确的整数分段，无穷大单独累计
+        parts = [chunk[self.keys]]
+        for position, column in enumerate(self.values):
+            if not pd.api.types.is_integer_dtype(chunk[column]):
+                self._floating[position] = True
+            values = chunk[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            limbs, first = _exact_limbs(values)
+            names = [self._limb_column(position, first + j) for j in range(limbs.shape[1])]
+            parts.append(pd.DataFrame(limbs, columns=names, index=chunk.index))
+            parts.append(pd.DataFrame({self._limb_column(position, 'inf'): np.where(np.isinf(values), values, 0.0)},
+                                      index=chunk.index))
+        work = pd.concat(parts, axis=1)
+
+        partial = work.groupby(self.keys, observed=True, dropna=self.dropna).sum().reset_index()
+        for key in self.keys:
+            if isinstance(partial[key].dtype, pd.CategoricalDtype):
+                partial[key] = partial[key].astype(partial[key].cat.categories.dtype)
+        self._partials.append(partial)
+        self._partial_rows += len(partial)
+        if self._partial_rows >= self.merge_rows:
+            self._merge()
+
+    def _merge(self):
+        """把缓存的块内结果合并到累计结果中"""
+        parts = self._partials if self._total is None else [self._total] + self._partials
+        self._partials, self._partial_rows = [], 0
+        if len(parts) == 1:
+            self._total = parts[0]
+            return
+        # 不同分块的分段范围不同，缺少的分段补0（保持整数类型，不经过浮点数）
+        columns = list(dict.fromkeys(name for part in parts for name in part.columns))
+        self._total = pd.concat([part.reindex(columns=columns, fill_value=0) for part in parts], ignore_index=True) \
+            .groupby(self.keys, sort=False, dropna=self.dropna).sum().reset_index()
+
+    def unique(self, key: str) -> np.ndarray:
+        """
+        返回分组键出现过的取值，按首次出现的行号排列（包括缺失值），与 Series.unique() 一致
+        """
+        return np.array([value for _, value in sorted(self._first[key].values(), key=lambda item: item[0])],
+                        dtype=object)
+
+    def result(self) -> pd.DataFrame:
+        """返回以分组键为索引、按分组键排序的求和结果"""
+        if self._partials:
+            self._merge()
+        if self._total is None:
+            index = pd.MultiIndex.from_arrays([[] for _ in self.keys], names=self.keys) \
+                if len(self.keys) > 1 else pd.Index([], name=self.keys[0])
+            return pd.DataFrame(columns=self.values, index=index, dtype=float)
+
+        total = self._total.set_index(self.keys).sort_index()
+        result = pd.DataFrame(index=total.index)
+        for position, column in enumerate(self.values):
+            prefix = self._limb_column(position, '')
+            limbs = sorted(int(name[len(prefix):]) for name in total.columns
+                           if name.startswith(prefix) and name != prefix + 'inf')
+            # 分段序号补成连续的范围，缺少的分段为0
+            first = limbs[0]
+            names = [self._limb_column(position, limb) for limb in range(first, limbs[-1] + 1)]
+            matrix = total.reindex(columns=names, fill_value=0).to_numpy(dtype=np.int64)
+            sums = _limbs_to_float(matrix, first)
+            infinite = total[prefix + 'inf'].to_numpy()
+            sums = np.where(infinite != 0, infinite, sums)
+            result[column] = sums if self._floating[position] else sums.astype(np.int64)
+        return result
+
+
+class CountyCube:
+    """
+    县（区）级土地出让汇总立方体
+
+    以 (省, 市, 县, 年份, 行业分类, 土地用途, 供地方式) 为键，保存供地面积、成交价格
+    以及每宗地 面积 × 成交价格 之和（总价值），类别缺失的交易单独成组，不会丢失。
+    立方体只需从交易明细构建一次，之后任何区县的报告都只是按县名取出对应的行，
+    不再扫描交易明细。
+
+    参数:
+        data (pd.DataFrame): 包含 KEYS 和 VALUES 列的汇总数据
+    """
+    KEYS = ['省', '市', '县', '年份', '行业分类', '土地用途', '供地方式']
+    # 立方体的计算方式变化时修改，使旧的缓存失效（2: 精确求和）
+    CACHE_VERSION = 2
+    VALUES = ['供地面积_公顷', '成交价格_万元', '总价值']
+
+    def __init__(self, data: pd.DataFrame):
+        missing = [col for col in self.KEYS + self.VALUES if col not in data.columns]
+        if missing:
+            raise ValueError(f"汇总数据缺少列: {missing}")
+        self.data = data[self.KEYS + self.VALUES].reset_index(drop=True)
+        self._rows: Optional[Dict[str, np.ndarray]] = None
+
+    # ---------- 构建与持久化 ----------
+    @classmethod
+    def build(cls, reader) -> 'CountyCube':
+        """
+        从交易明细分块构建立方体
+
+        参数:
+            reader: 交易数据来源（LandTransactionReader 或 LandDataset）
+
+        返回:
+            CountyCube: 汇总立方体
+        """
+        cube = GroupedSum(cls.KEYS, cls.VALUES, dropna=False)
+        for chunk in reader.chunks(cls.KEYS + list(LAND_VALUE_COLUMNS)):
+            cube.add(chunk.assign(总价值=chunk['供地面积_公顷'] * chunk['成交价格_万元']))
+        return cls(cube.result().reset_index())
+
+    def save(self, path: str):
+        """将立方体写入Feather文件（需要 pyarrow）"""
+        if feather is None:
+            raise ValueError("保存县域汇总立方体需要 pyarrow")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            self.data.to_feather(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CountyCube':
+        """从Feather文件加载立方体（需要 pyarrow）"""
+        if feather is None:
+            raise ValueError("加载县域汇总立方体需要 pyarrow")
+        return cls(pd.read_feather(path))
+
+    @classmethod
+    def cached(cls, source=None, cache_dir: str = DEFAULT_CUBE_DIR, rebuild: bool = False) -> 'CountyCube':
+        """
+        返回交易数据对应的立方体：缓存中有与数据内容一致的立方体时直接加载，
+        否则从交易明细构建并写入缓存（pyarrow 未安装时只在内存中构建）
+
+        参数:
+            source: LandTransactionReader、LandDataset，或CSV文件/数据集目录的路径；
+                为None时使用 open_land_source() 的默认数据
+            cache_dir (str): 缓存目录
+            rebuild (bool): 为True时忽略已有缓存重新构建
+
+        返回:
+            CountyCube: 汇总立方体
+        """
+        if source is None:
+            source = open_land_source()
+        elif isinstance(source, str):
+            source = open_land_source(source, dataset_root=source if os.path.isdir(source) else None)
+
+        path = os.path.join(cache_dir, f"{source.fingerprint()}.v{cls.CACHE_VERSION}.arrow")
+        if feather is not None and not rebuild and os.path.exists(path):
+            return cls.load(path)
+        cube = cls.build(source)
+        if feather is not None:
+            cube.save(path)
+        return cube
+
+    # ---------- 查询 ----------
+    def counties(self) -> pd.DataFrame:
+        """返回立方体中的所有 (省, 市, 县)，按省、市、县排序"""
+        return self.data[['省', '市', '县']].dropna(subset=['县']).drop_duplicates() \
+            .sort_values(['省', '市', '县']).reset_index(drop=True)
+
+    def district(self, county: str, city: Optional[str] = None) -> pd.DataFrame:
+        """
+        取出一个区县的汇总行
+
+        参数:
+            county (str): 县（区）名称，如 '望城区'
+            city (str): 所属城市，县名在多个城市中重复时用于区分，可以带或不带"市"
+
+        返回:
+            pd.DataFrame: 该区县的汇总行；区县不存在时为空表
+        """
+        if self._rows is None:
+            # 县名 -> 行号，只在第一次查询时构建
+            self._rows = self.data.groupby('县', sort=False).indices
+        rows = self.data.iloc[self._rows.get(county, np.array([], dtype=np.intp))]
+        if city is not None:
+            rows = filter_city(rows, city)
+        elif rows['市'].nunique() > 1:
+            raise ValueError(f"{county} 出现在多个城市中 {rows['市'].unique().tolist()}，请指定 city")
+        return rows
+
+    def district_report(self, county: str, city: Optional[str] = None,
+                        industries: Iterable[str] = REPORT_INDUSTRIES) -> Dict[str, pd.DataFrame]:
+        """
+        生成区县的年度土地出让报告
+
+        参数:
+            county (str): 县（区）名称
+            city (str): 所属城市，见 district
+            industries (Iterable[str]): 年度行业统计中的汇总类别
+
+        返回:
+            dict[str, pd.DataFrame]: {sheet名称: 数据}，包括 年度行业统计、土地用途统计、
+                供地方式统计；区县不存在时为空字典
+        """
+        rows = self.district(county, city)
+        if len(rows) == 0:
+            return {}
+        industries = list(industries)
+
+        # 各行业的总面积和总价值
+        industry_cube = rows.groupby(['年份', '行业分类'])[['供地面积_公顷', '总价值']].sum()
+        yearly_totals = rows.groupby('年份')[['供地面积_公顷', '成交价格_万元']].sum()
+        years = yearly_totals.index
+        rollup = INDUSTRY_TAXONOMY.subset(industries).rollup(
+            industry_cube['供地面积_公顷'].unstack(fill_value=0).reindex(years, fill_value=0),
+            industry_cube['总价值'].unstack(fill_value=0).reindex(years, fill_value=0),
+            total_area=yearly_totals['供地面积_公顷'],
+        )
+        yearly = pd.concat([rollup, yearly_totals], axis=1).rename_axis('年份').reset_index()
+        yearly = yearly[
+            ['年份']
+            + [f'{industry}_{measure}' for industry in industries for measure in ['总面积', '总价值']]
+            + ['供地面积_公顷', '成交价格_万元']
+            + [f'{industry}_{measure}' for industry in industries for measure in ['占比', '平均价格']]
+        ]
+
+        def category_pivot(column):
+            # 与 pd.pivot_table(rows, values=[面积, 价格], index=['年份'], columns=[column],
+            # aggfunc='sum', fill_value=0) 相同，但省去透视表的通用处理
+            pivot = rows.groupby(['年份', column])[['供地面积_公顷', '成交价格_万元']].sum()
+            return pivot.unstack(column, fill_value=0).sort_index(axis=1).reset_index()
+
+        return {
+            '年度行业统计': yearly,
+            '土地用途统计': category_pivot('土地用途'),
+            '供地方式统计': category_pivot('供地方式'),
+        }
+
+
+def write_district_workbook(report: Dict[str, pd.DataFrame], output_file: str,
+                            transactions: Optional[pd.DataFrame] = None):
+    """
+    将区县报告写入Excel工作簿
+
+    参数:
+        report (dict): district_report 的结果
+        output_file (str): 输出文件路径
+        transactions (pd.DataFrame): 区县的交易明细，提供时写入 原始数据 sheet
+    """
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for sheet_name, data in report.items():
+            # 年度行业统计不写索引，透视表保留原来的索引列
+            data.to_excel(writer, sheet_name=sheet_name, index=sheet_name != '年度行业统计')
+        if transactions is not None:
+            transactions.to_excel(writer, sheet_name='原始数据', index=False)
+
+
+def district_report(county: str, city: Optional[str] = None, source=None) -> Dict[str, pd.DataFrame]:
+    """
+    生成区县的年度土地出让报告，使用交易数据对应的缓存立方体
+
+    参数:
+        county (str): 县（区）名称，如 '望城区'
+        city (str): 所属城市，县名在多个城市中重复时用于区分
+        source: 交易数据来源，见 CountyCube.cached
+
+    返回:
+        dict[str, pd.DataFrame]: 见 CountyCube.district_report
+    """
+    return CountyCube.cached(source).district_report(county, city)
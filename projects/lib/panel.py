@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Hashable, Iterable, Tuple
+
+
+class PanelIndex:
+    """
+    城市 × 年份面板骨架
+
+    面板按城市列表的原始顺序、年份升序排列，第 i 个城市第 j 个年份位于第
+    i * len(years) + j 行。对齐一个sheet时只需把每行的 (城市, 年份) 转成这个整数
+    位置，再按位置取行，不需要按字符串键做哈希连接。
+
+    参数:
+        cities (Iterable): 城市列表，顺序即面板中的城市顺序
+        years (Iterable): 年份列表，会被排序
+    """
+    def __init__(self, cities: Iterable[Hashable], years: Iterable[int]):
+        self.cities = pd.Index(list(cities))
+        self.years = pd.Index(sorted(int(year) for year in years))
+        if not self.cities.is_unique:
+            raise ValueError("城市列表中存在重复的城市")
+        if not self.years.is_unique:
+            raise ValueError("年份列表中存在重复的年份")
+
+    def __len__(self) -> int:
+        return len(self.cities) * len(self.years)
+
+    def skeleton(self, city_col: str, year_col: str) -> pd.DataFrame:
+        """
+        生成完整的面板数据框架（所有城市和年份的组合）
+
+        参数:
+            city_col (str): 城市列名
+            year_col (str): 年份列名
+
+        返回:
+            pd.DataFrame: 两列的面板骨架，年份为整数
+        """
+        return pd.DataFrame({
+            city_col: np.repeat(self.cities.to_numpy(), len(self.years)),
+            year_col: np.tile(self.years.to_numpy(dtype=np.int64), len(self.cities)),
+        })
+
+    def codes(self, city_values, year_values) -> np.ndarray:
+        """
+        计算每行在面板中的整数位置
+
+        参数:
+            city_values: 城市列
+            year_values: 年份列，可以是字符串或浮点数形式的年份
+
+        返回:
+            np.ndarray: 面板位置，城市或年份不在面板中的行为 -1
+        """
+        city_pos = self.cities.get_indexer(pd.Index(city_values))
+        years = pd.to_numeric(pd.Series(year_values), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        year_pos = np.full(len(years), -1, dtype=np.intp)
+        integral = ~np.isnan(years) & (years == np.round(years))
+        year_pos[integral] = self.years.get_indexer(years[integral].astype(np.int64))
+        return np.where((city_pos >= 0) & (year_pos >= 0), city_pos * len(self.years) + year_pos, -1)
+
+    def align(self, data: pd.DataFrame, city_col: str, year_col: str) -> pd.DataFrame:
+        """
+        将sheet数据对齐到面板骨架，效果等同于 pd.merge(skeleton, data, how='left')
+
+        不在面板中的行被丢弃；同一 (城市, 年份) 出现多次时保留第一行并打印警告。
+
+        参数:
+            data (pd.DataFrame): 需要对齐的数据，包含城市列和年份列
+            city_col (str): 城市列名
+            year_col (str): 年份列名
+
+        返回:
+            pd.DataFrame: 行数为 len(self) 的面板数据，城市列和年份列在最前
+        """
+        for col in [city_col, year_col]:
+            if col not in data.columns:
+                raise ValueError(f"列 {col} 不存在于数据中")
+
+        codes = self.codes(data[city_col], data[year_col])
+        rows = np.flatnonzero(codes >= 0)
+        unique_codes, first = np.unique(codes[rows], return_index=True)
+        if len(unique_codes) < len(rows):
+            print(f"警告: {len(rows) - len(unique_codes)} 行的 ({city_col}, {year_col}) 重复，只保留第一行")
+
+        # 面板中每个位置对应 data 中的行号，没有数据的位置指向一个不存在的行号（取出全为缺失值）
+        values = data.drop(columns=[city_col, year_col]).reset_index(drop=True)
+        positions = np.full(len(self), len(values), dtype=np.intp)
+        positions[unique_codes] = rows[first]
+        aligned = values.reindex(positions).reset_index(drop=True)
+
+        skeleton = self.skeleton(city_col, year_col)
+        return pd.concat([skeleton, aligned], axis=1)
+
+
+@lru_cache(maxsize=None)
+def _cached_panel(cities: Tuple[Hashable, ...], years: Tuple[int, ...]) -> PanelIndex:
+    return PanelIndex(cities, years)
+
+
+def panel_index(cities: Iterable[Hashable], years: Iterable[int]) -> PanelIndex:
+    """
+    返回城市 × 年份的面板骨架，相同的城市和年份列表在进程内只构建一次
+
+    参数:
+        cities (Iterable): 城市列表
+        years (Iterable): 年份列表
+
+    返回:
+        PanelIndex: 面板骨架
+    """
+    return _cached_panel(tuple(cities), tuple(sorted(int(year) for year in years)))
@@ -0,0 +1,332 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import pandas as pd
+from lib.step_cache import StepCache
+from lib.writer import WriteSession
+
+# 由主进程统一写入的工作簿类型
+WORKBOOK_SUFFIXES = ('.xlsx', '.xlsm')
+
+# 工作进程返回的暂存数据：文件绝对路径 -> {sheet名称: (数据, 是否写入索引)}
+StagedSheets = Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]]
+
+
+@dataclass(frozen=True)
+class Artifact:
+    """
+    步骤的输入或输出：一个文件（或目录），或者工作簿中的一个sheet
+
+    参数:
+        path: 文件路径
+        sheet: sheet名称，为None时表示整个文件
+    """
+    path: str
+    sheet: Optional[str] = None
+
+    @classmethod
+    def parse(cls, value: Union['Artifact', str, Tuple[str, str]]) -> 'Artifact':
+        """接受 Artifact、'路径'、'路径::sheet' 或 (路径, sheet)"""
+        if isinstance(value, Artifact):
+            return value
+        if isinstance(value, tuple):
+            return cls(*value)
+        path, _, sheet = value.partition('::')
+        return cls(path, sheet or None)
+
+    @property
+    def key(self) -> str:
+        return os.path.abspath(self.path)
+
+    def covers(self, other: 'Artifact') -> bool:
+        """同一个文件，且其中一方是整个文件或两者是同一个sheet"""
+        return self.key == other.key and (self.sheet is None or other.sheet is None or self.sheet == other.sheet)
+
+    def __str__(self) -> str:
+        return f"{self.path}::{self.sheet}" if self.sheet else self.path
+
+
+@dataclass
+class Step:
+    """
+    流水线中的一个步骤
+
+    func 必须是模块级函数（工作进程通过 pickle 按名称找到它）。步骤写入工作簿的
+    sheet 通过 WriteSession 暂存，由主进程统一写入；其他输出（CSV等）由步骤自己写入。
+
+    参数:
+        name: 步骤名称
+        func: 执行的函数
+        args: 位置参数
+        kwargs: 关键字参数
+        inputs: 读取的文件或sheet
+        outputs: 生成的文件或sheet
+        version: 代码版本，步骤依赖项目目录以外的代码（或外部数据约定）变化时手动修改，使缓存失效
+        cache: 为False时总是运行、不使用缓存，用于结果取决于输出文件当前状态的步骤
+    """
+    name: str
+    func: Callable
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    inputs: List[Artifact] = field(default_factory=list)
+    outputs: List[Artifact] = field(default_factory=list)
+    version: str = ''
+    cache: bool = True
+
+    def __post_init__(self):
+        self.args = tuple(self.args)
+        self.inputs = [Artifact.parse(value) for value in self.inputs]
+        self.outputs = [Artifact.parse(value) for value in self.outputs]
+
+    @property
+    def workbooks(self) -> List[str]:
+        """输出中的工作簿（按 WORKBOOK_SUFFIXES 判断）"""
+        return list(dict.fromkeys(artifact.path for artifact in self.outputs
+                                  if artifact.path.lower().endswith(WORKBOOK_SUFFIXES)))
+
+
+def _execute(step: Step, cache: Optional[StepCache] = None, rebuild: bool = False) -> Tuple[StagedSheets, float, bool]:
+    """
+    在工作进程中运行步骤
+
+    每个输出工作簿都有一个激活的写入会话，步骤中的 close_file_and_save 等写操作只暂存
+    数据；所有会话的提交都被延迟，暂存的sheet返回给主进程写入。使用缓存时先计算指纹，
+    命中则恢复上次的产物而不运行步骤。
+
+    返回:
+        (暂存的sheet, 用时, 是否命中缓存)
+    """
+    start = time.perf_counter()
+    fingerprint = cache.fingerprint(step) if cache is not None and step.cache else None
+    if fingerprint is not None and not rebuild:
+        restored = cache.restore(step, fingerprint)
+        if restored is not None:
+            return restored, time.perf_counter() - start, True
+
+    with WriteSession.deferred() as outbox:
+        with ExitStack() as stack:
+            for path in step.workbooks:
+                stack.enter_context(WriteSession(path))
+            step.func(*step.args, **step.kwargs)
+    if fingerprint is not None:
+        cache.store(step, fingerprint, outbox)
+    return outbox, time.perf_counter() - start, False
+
+
+class Pipeline:
+    """
+    按输入输出声明构建依赖图，并行运行相互独立的步骤
+
+    步骤 B 的某个输入由步骤 A 输出时，B 在 A 完成后运行；其余步骤在进程池中并发执行。
+    工作簿由主进程作为唯一的写入方：各步骤暂存的sheet按工作簿合并，在写入该工作簿的
+    步骤全部完成时（或下游步骤需要读取时）写入，每个工作簿通常只序列化一次。
+
+    参数:
+        steps (Iterable[Step]): 步骤，声明顺序即同一批就绪步骤的提交顺序
+    """
+    def __init__(self, steps: Iterable[Step] = ()):
+        self.steps: Dict[str, Step] = {}
+        for step in steps:
+            self.add(step)
+
+    def add(self, step: Step) -> None:
+        """
+        添加步骤
+
+        参数:
+            step (Step): 步骤，名称和输出不能与已有步骤重复
+        """
+        if step.name in self.steps:
+            raise ValueError(f"步骤 '{step.name}' 已存在")
+        for other in self.steps.values():
+            # 在其他步骤生成的文件中写入sheet是允许的，同一个文件或同一个sheet只能由一个步骤生成
+            overlap = [str(output) for output in step.outputs
+                       if any((output.key, output.sheet) == (o.key, o.sheet) for o in other.outputs)]
+            if overlap:
+                raise ValueError(f"步骤 '{step.name}' 与 '{other.name}' 输出了相同的产物: {overlap}")
+        self.steps[step.name] = step
+
+    def producers(self, artifact: Artifact) -> List[str]:
+        """返回输出了该产物（或包含它的文件）的步骤名称"""
+        return [step.name for step in self.steps.values()
+                if any(output.covers(artifact) for output in step.outputs)]
+
+    def containers(self, name: str) -> List[str]:
+        """
+        返回生成了该步骤所写入sheet的整个文件的步骤名称
+
+        参数:
+            name (str): 步骤名称
+
+        返回:
+            list[str]: 输出为整个文件、且该步骤在其中写入sheet的步骤名称
+        """
+        keys = {output.key for output in self.steps[name].outputs if output.sheet is not None}
+        return [other_name for other_name, other in self.steps.items()
+                if other_name != name and any(output.sheet is None and output.key in keys for output in other.outputs)]
+
+    def dependencies(self) -> Dict[str, List[str]]:
+        """
+        返回每个步骤直接依赖的步骤
+
+        返回:
+            dict[str, list[str]]: 步骤名称 -> 输出了其输入的步骤名称
+        """
+        result = {}
+        for name, step in self.steps.items():
+            upstream = []
+            for other_name, other in self.steps.items():
+                if other_name != name and any(output.covers(artifact)
+                                              for output in other.outputs for artifact in step.inputs):
+                    upstream.append(other_name)
+            result[name] = upstream
+        return result
+
+    def order(self, targets: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        按依赖关系排序的步骤名称
+
+        参数:
+            targets (Iterable[str]): 需要运行的步骤，会自动加入它们依赖的步骤，以及生成它们写入sheet的
+                文件的步骤（保证写入前文件已存在）；为None时为全部步骤
+
+        返回:
+            list[str]: 拓扑排序后的步骤名称，依赖相同时保持声明顺序
+        """
+        dependencies = self.dependencies()
+        if targets is None:
+            selected = set(self.steps)
+        else:
+            unknown = [name for name in targets if name not in self.steps]
+            if unknown:
+                raise ValueError(f"未知的步骤: {unknown}")
+            selected, stack = set(), list(targets)
+            while stack:
+                name = stack.pop()
+                if name not in selected:
+                    selected.add(name)
+                    stack.extend(dependencies[name])
+                    stack.extend(self.containers(name))
+
+        ordered: List[str] = []
+        remaining = [name for name in self.steps if name in selected]
+        while remaining:
+            ready = [name for name in remaining if all(dep in ordered for dep in dependencies[name])]
+            if not ready:
+                raise ValueError(f"步骤之间存在循环依赖: {remaining}")
+            ordered.extend(ready)
+            remaining = [name for name in remaining if name not in ready]
+        return ordered
+
+    def run(self, targets: Optional[Iterable[str]] = None, workers: Optional[int] = None,
+            cache: Optional[StepCache] = None, rebuild: bool = False) -> Dict[str, float]:
+        """
+        运行步骤
+
+        输入文件既不存在、也不由任何步骤生成的步骤（以及它的下游步骤）会被跳过。
+        任一步骤失败时不再提交新的步骤，已暂存但未写入的sheet全部丢弃，并抛出该异常。
+
+        参数:
+            targets (Iterable[str]): 需要运行的步骤，为None时运行全部步骤
+            workers (int): 进程数，默认为 CPU 核数；为1时在当前进程中依次运行
+            cache (StepCache): 产物缓存，输入、参数和代码都没有变化的步骤直接恢复上次的产物；
+                为None时不使用缓存
+            rebuild (bool): 为True时忽略已有的缓存重新运行所有步骤（结果仍写入缓存）
+
+        返回:
+            dict[str, float]: 每个已运行步骤的耗时（秒）
+        """
+        start = time.perf_counter()
+        dependencies = self.dependencies()
+        names = []
+        skipped = set()
+        for name in self.order(targets):
+            step = self.steps[name]
+            missing = [str(artifact) for artifact in step.inputs
+                       if not self.producers(artifact) and not os.path.exists(artifact.path)]
+            blocked = [dep for dep in dependencies[name] if dep in skipped]
+            if missing or blocked:
+                skipped.add(name)
+                print(f"跳过步骤 {name}: " + (f"缺少输入 {missing}" if missing else f"依赖的步骤 {blocked} 未运行"))
+            else:
+                names.append(name)
+
+        staged: StagedSheets = {}
+        elapsed: Dict[str, float] = {}
+        cached: set = set()
+        done: set = set()
+        remaining = list(names)
+        # 每个工作簿由哪些步骤写入，这些步骤全部完成后即可写入该工作簿
+        writers: Dict[str, List[str]] = {}
+        for name in names:
+            for path in self.steps[name].workbooks:
+                writers.setdefault(os.path.abspath(path), []).append(name)
+
+        def collect(name: str, result: Tuple[StagedSheets, float, bool]) -> None:
+            outbox, seconds, hit = result
+            for path, sheets in outbox.items():
+                staged.setdefault(path, {}).update(sheets)
+            elapsed[name] = seconds
+            done.add(name)
+            if hit:
+                cached.add(name)
+                print(f"步骤 {name} 的输入和代码未变化，已从缓存恢复（{seconds:.2f} 秒）")
+            else:
+                print(f"步骤 {name} 完成，用时 {seconds:.2f} 秒")
+
+        def flush_inputs(step: Step) -> None:
+            # 步骤要读取的sheet（或整个工作簿）还有未写入的暂存数据时先写入
+            for artifact in step.inputs:
+                sheets = staged.get(artifact.key)
+                if sheets and (artifact.sheet is None or artifact.sheet in sheets):
+                    self._commit(artifact.key, staged.pop(artifact.key))
+
+        def flush_finished() -> None:
+            # 写入所有写入方都已完成的工作簿，与仍在运行的步骤并行
+            for path in list(staged):
+                if all(name in done for name in writers.get(path, [])):
+                    self._commit(path, staged.pop(path))
+
+        def ready() -> List[str]:
+            return [name for name in remaining if all(dep in done for dep in dependencies[name])]
+
+        if workers == 1:
+            for name in remaining:
+                flush_inputs(self.steps[name])
+                collect(name, _execute(self.steps[name], cache, rebuild))
+                flush_finished()
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                running: Dict[Future, str] = {}
+                try:
+                    while remaining or running:
+                        for name in ready():
+                            flush_inputs(self.steps[name])
+                            running[pool.submit(_execute, self.steps[name], cache, rebuild)] = name
+                            remaining.remove(name)
+                        flush_finished()
+                        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            collect(running.pop(future), future.result())
+                    flush_finished()
+                except BaseException:
+                    for future in running:
+                        future.cancel()
+                    print("流水线运行失败，未写入的sheet已丢弃")
+                    raise
+
+        for path in list(staged):
+            self._commit(path, staged.pop(path))
+        total = time.perf_counter() - start
+        print(f"流水线完成: 运行 {len(elapsed) - len(cached)} 个步骤，从缓存恢复 {len(cached)} 个，跳过 {len(skipped)} 个，"
+              f"总用时 {total:.2f} 秒（各步骤用时合计 {sum(elapsed.values()):.2f} 秒）")
+        return elapsed
+
+    @staticmethod
+    def _commit(path: str, sheets: Dict[str, Tuple[pd.DataFrame, bool]]) -> None:
+        session = WriteSession(path)
+        session.staged.update(sheets)
+        session.commit()
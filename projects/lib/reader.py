@@ -1,21 +1,66 @@
+import numpy as np
 import pandas as pd
+from typing import Dict, Hashable, List, Optional
+from lib.workbook import workbook_registry
+
+try:
+    import pyarrow as pa
+except ImportError:  # 只有 as_arrow=True 时需要 pyarrow
+    pa = None
 
 class ExcelReader:
     def __init__(self, file_path):
         self.file_path = file_path
-        
+
     def read_column(self, sheet_name, column_name):
         """读取指定sheet中的指定列数据，返回列表"""
-        df = pd.read_excel(self.file_path, sheet_name=sheet_name)
-        if column_name in df.columns:
-            return df[column_name].tolist()
-        else:
-            raise ValueError(f"Column '{column_name}' not found in sheet '{sheet_name}'")
+        return self.read_columns(sheet_name, columns=[column_name])[column_name].tolist()
 
     def read_column_by_index(self, sheet_name, column_index):
         """读取指定sheet中的指定列索引的数据，返回列表"""
-        df = pd.read_excel(self.file_path, sheet_name=sheet_name)
-        if column_index < len(df.columns):
-            return df.iloc[:, column_index].tolist()
-        else:
-            raise ValueError(f"Column index '{column_index}' out of range for sheet '{sheet_name}'")
+        return next(iter(self.read_columns(sheet_name, indices=[column_index]).values())).tolist()
+
+    def read_columns(self, sheet_name: str, columns: Optional[List[Hashable]] = None,
+                     indices: Optional[List[int]] = None, as_arrow: bool = False):
+        """
+        一次读取指定sheet中的多列数据
+
+        sheet在进程内只解析一次，之后的调用（包括 read_column 等）共享同一份解析结果。
+
+        参数:
+            sheet_name (str): sheet名称
+            columns (list): 按列名选择的列
+            indices (list[int]): 按列索引选择的列，可以与 columns 同时使用
+            as_arrow (bool): 为True时返回 pyarrow.Table，否则返回 {列名: np.ndarray}
+
+        返回:
+            dict[列名, np.ndarray] 或 pyarrow.Table，列顺序为先 columns 后 indices
+        """
+        df = workbook_registry.read_sheet(self.file_path, sheet_name, copy=False)
+
+        labels = []
+        for column_name in columns or []:
+            if column_name not in df.columns:
+                raise ValueError(f"Column '{column_name}' not found in sheet '{sheet_name}'")
+            labels.append(column_name)
+        for column_index in indices or []:
+            if not -len(df.columns) <= column_index < len(df.columns):
+                raise ValueError(f"Column index '{column_index}' out of range for sheet '{sheet_name}'")
+            labels.append(df.columns[column_index])
+        labels = list(dict.fromkeys(labels))
+
+        if as_arrow:
+            if pa is None:
+                raise ValueError("as_arrow=True requires pyarrow")
+            return pa.Table.from_arrays(
+                [pa.Array.from_pandas(df[label]) for label in labels],
+                names=[str(label) for label in labels],
+            )
+
+        # 数值列直接返回共享缓存的底层数组，设为只读防止调用方修改缓存
+        result: Dict[Hashable, np.ndarray] = {}
+        for label in labels:
+            values = df[label].to_numpy()
+            values.flags.writeable = False
+            result[label] = values
+        return result
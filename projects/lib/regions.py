@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from lib.city_index import CityIndex
+
+# 自治区城市
+AUTONOMOUS_REGION_CITIES = [
+    # 广西壮族自治区
+    "南宁", "柳州", "桂林", "梧州", "北海", "防城港", "钦州", "贵港", "玉林", "百色", "贺州", "河池", "来宾", "崇左",
+    # 内蒙古自治区
+    "呼和浩特", "包头", "乌海", "赤峰", "通辽", "鄂尔多斯", "呼伦贝尔", "巴彦淖尔", "乌兰察布", "兴安盟", "锡林郭勒盟", "阿拉善盟",
+    # 宁夏回族自治区
+    "银川", "石嘴山", "吴忠", "固原", "中卫",
+    # 新疆维吾尔自治区
+    "乌鲁木齐", "克拉玛依", "吐鲁番", "哈密", "昌吉", "博尔塔拉", "巴音郭楞", "阿克苏", "克孜勒苏", "喀什", "和田", "伊犁", "塔城", "阿勒泰",
+    # 西藏自治区
+    "拉萨", "日喀则", "昌都", "林芝", "山南", "那曲", "阿里",
+]
+
+# 副省级城市和省会城市（按地理大区排序）
+SUB_PROVINCIAL_CITIES = [
+    "北京", "天津", "石家庄", "太原",                                       # 华北
+    "沈阳", "大连", "长春", "哈尔滨",                                       # 东北
+    "上海", "南京", "杭州", "合肥", "福州", "南昌", "济南", "青岛", "宁波", "厦门",  # 华东
+    "郑州", "武汉", "长沙",                                                 # 华中
+    "广州", "深圳", "海口",                                                 # 华南
+    "重庆", "成都", "贵阳", "昆明",                                         # 西南
+    "西安", "兰州", "西宁",                                                 # 西北
+]
+
+# 部分撤县设市城市
+COUNTY_TO_CITY_CITIES = [
+    "九江", "合肥", "铜仁",
+    "海东", "昌都", "日喀则", "咸阳", "南通", "荆门", "朔州", "唐山",
+    "安庆", "滨州", "昭通", "平凉", "黑河", "宣城", "芜湖", "邵阳",
+    "遂宁", "延安", "新乡", "温州", "玉溪", "赣州", "荆州", "安康",
+    "永州",
+]
+
+# 东部城市（京津沪、辽宁、河北、山东、江苏、浙江、福建、广东和海南的城市）
+EASTERN_CITIES = [
+    "北京", "天津", "上海",
+    # 辽宁省
+    "沈阳", "大连", "鞍山", "抚顺", "本溪", "丹东", "锦州", "营口", "阜新", "辽阳", "盘锦", "铁岭", "朝阳", "葫芦岛",
+    # 河北省
+    "石家庄", "唐山", "秦皇岛", "邯郸", "邢台", "保定", "张家口", "承德", "沧州", "廊坊", "衡水",
+    # 山东省
+    "济南", "青岛", "淄博", "枣庄", "东营", "烟台", "潍坊", "济宁", "泰安", "威海", "日照", "莱芜", "临沂", "德州", "聊城", "滨州", "菏泽",
+    # 江苏省
+    "南京", "无锡", "徐州", "常州", "苏州", "南通", "连云港", "淮安", "盐城", "扬州", "镇江", "泰州", "宿迁",
+    # 浙江省
+    "杭州", "宁波", "温州", "嘉兴", "湖州", "绍兴", "金华", "衢州", "舟山", "台州", "丽水",
+    # 福建省
+    "福州", "厦门", "莆田", "三明", "泉州", "漳州", "南平", "龙岩", "宁德",
+    # 广东省
+    "广州", "韶关", "深圳", "珠海", "汕头", "佛山", "江门", "湛江", "茂名", "肇庆", "惠州", "梅州", "汕尾", "河源", "阳江", "清远", "东莞", "中山", "潮州", "揭阳", "云浮",
+    # 海南省
+    "海口", "三亚", "三沙", "儋州",
+]
+
+# 东中西部省份
+PROVINCE_REGIONS: Dict[str, List[str]] = {
+    '东部': [
+        "北京市", "天津市", "上海市", "辽宁省", "河北省", "山东省",
+        "江苏省", "浙江省", "福建省", "广东省", "海南省",
+    ],
+    '中部': [
+        "山西省", "吉林省", "黑龙江省", "安徽省", "江西省",
+        "河南省", "湖北省", "湖南省",
+    ],
+    '西部': [
+        "内蒙古自治区", "广西壮族自治区", "重庆市", "四川省", "贵州省",
+        "云南省", "西藏自治区", "陕西省", "甘肃省", "青海省",
+        "宁夏回族自治区", "新疆维吾尔自治区",
+    ],
+}
+UNCLASSIFIED_REGION = '未分类'
+
+# 城市区域类型编码
+REGION_TYPE_EASTERN = 1
+REGION_TYPE_OTHER = 2
+
+
+class CityAttributeTable:
+    """
+    城市属性表
+
+    每个城市一行，列为整数编码的标识：autonomous_region（自治区城市）、
+    sub_provincial（副省级和省会城市）、county_to_city（撤县设市）、
+    region_type（1=东部，2=中西部）。查询时先用 CityIndex 把整列城市名称一次性
+    转换为城市ID，再按ID取行，不需要逐个城市在列表中查找。
+
+    参数:
+        cities (Iterable[str]): 标准城市名称，属性列表中出现的城市会自动加入
+        flags (dict[str, Iterable[str]]): 标识列名 -> 标识为1的城市
+        eastern_cities (Iterable[str]): region_type 为东部的城市
+    """
+    def __init__(self, cities: Iterable[str], flags: Dict[str, Iterable[str]],
+                 eastern_cities: Iterable[str]):
+        flags = {name: list(members) for name, members in flags.items()}
+        eastern_cities = list(eastern_cities)
+        names = list(dict.fromkeys([*cities, *(city for members in flags.values() for city in members), *eastern_cities]))
+        self.index = CityIndex(names)
+
+        columns = {}
+        for name, members in flags.items():
+            column = np.zeros(len(names), dtype=np.int8)
+            column[self.index.codes(members)] = 1
+            columns[name] = column
+        region_type = np.full(len(names), REGION_TYPE_OTHER, dtype=np.int8)
+        region_type[self.index.codes(eastern_cities)] = REGION_TYPE_EASTERN
+        columns['region_type'] = region_type
+        self.table = pd.DataFrame(columns, index=self.index.cities)
+
+        # 无法匹配的城市使用最后一行：所有标识为0，region_type 为中西部
+        self._values = np.vstack([self.table.to_numpy(), self._default_row()])
+
+    def _default_row(self) -> np.ndarray:
+        row = np.zeros(len(self.table.columns), dtype=np.int8)
+        row[self.table.columns.get_loc('region_type')] = REGION_TYPE_OTHER
+        return row
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.table.columns)
+
+    def lookup(self, values, index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        取出一列城市名称对应的属性
+
+        参数:
+            values: 城市名称列，可以带或不带"市"
+            index (pd.Index): 结果的索引，默认与 values 相同（values 为 Series 时）
+
+        返回:
+            pd.DataFrame: 每个名称一行的属性，无法匹配的城市所有标识为0、region_type 为2
+        """
+        codes = self.index.codes(values)
+        rows = np.where(codes >= 0, codes, len(self.table))
+        if index is None:
+            index = values.index if isinstance(values, pd.Series) else pd.RangeIndex(len(rows))
+        return pd.DataFrame(self._values[rows], columns=self.table.columns, index=index)
+
+
+class ProvinceRegionTable:
+    """
+    省份到东中西部区域的映射，区域以整数编码（按 PROVINCE_REGIONS 的顺序，0=东部），
+    未分类的省份编码为 -1
+
+    参数:
+        regions (dict[str, Iterable[str]]): 区域名称 -> 省份列表
+    """
+    def __init__(self, regions: Dict[str, Iterable[str]] = PROVINCE_REGIONS):
+        self.regions = list(regions)
+        self._lookup = {province: code for code, members in enumerate(regions.values()) for province in members}
+
+    def codes(self, values) -> np.ndarray:
+        """返回一列省份名称的区域编码，未分类的为 -1"""
+        codes, uniques = pd.factorize(pd.Series(values))
+        region_codes = np.fromiter((self._lookup.get(name, -1) for name in uniques), dtype=np.intp, count=len(uniques))
+        return np.where(codes >= 0, region_codes[np.maximum(codes, 0)], -1)
+
+    def region(self, values) -> pd.Series:
+        """
+        返回一列省份名称对应的区域名称
+
+        返回:
+            pd.Series: 东部/中部/西部，未分类的省份为 '未分类'，索引与 values 相同（values 为 Series 时）
+        """
+        # 编码 -1 正好取到最后的 '未分类'
+        names = np.array(self.regions + [UNCLASSIFIED_REGION], dtype=object)
+        index = values.index if isinstance(values, pd.Series) else None
+        return pd.Series(names[self.codes(values)], index=index, dtype=object)
+
+
+province_regions = ProvinceRegionTable()
+
+
+@lru_cache(maxsize=None)
+def default_city_attributes() -> CityAttributeTable:
+    """以 Constant.cities 及各属性列表中的城市为行的城市属性表，进程内只构建一次"""
+    from const import Constant
+    return CityAttributeTable(
+        Constant.cities,
+        flags={
+            'autonomous_region': AUTONOMOUS_REGION_CITIES,
+            'sub_provincial': SUB_PROVINCIAL_CITIES,
+            'county_to_city': COUNTY_TO_CITY_CITIES,
+        },
+        eastern_cities=EASTERN_CITIES,
+    )
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+# 支持的汇总方式：mean 在各层级由 (总和, 个数) 计算，保证上层的平均值不是下层平均值的平均
+ROLLUP_AGGREGATIONS = ('sum', 'mean')
+
+# 立方体中标记层级的列
+LEVEL_COLUMN = '层级'
+
+
+class RollupCube:
+    """
+    层级汇总的结果（整洁格式）
+
+    每行是一个层级的一个分组：LEVEL_COLUMN 为层级名称，层级以上的键列为所属分组，
+    层级以下的键列为空；时间列为空的行是跨所有时间的合计。
+
+    参数:
+        data (pd.DataFrame): 整洁格式的汇总数据
+        levels (list[str]): 层级键列，从粗到细
+        time (str): 时间列
+        top (str): 最高层级（全部数据）的名称
+        values (list[str]): 汇总的变量列
+    """
+    def __init__(self, data: pd.DataFrame, levels: List[str], time: str, top: str, values: List[str]):
+        self.data = data
+        self.levels = levels
+        self.time = time
+        self.top = top
+        self.values = values
+
+    def level(self, name: str, by_time: bool = True, values: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        取出某个层级的汇总
+
+        参数:
+            name (str): 层级名称，即层级键列名或 top
+            by_time (bool): True 时按时间分组，False 时为跨所有时间的合计
+            values (list[str]): 需要的变量列，默认全部
+
+        返回:
+            pd.DataFrame: 列为 [该层级的键列..., 时间列（by_time 时）, 变量列...]，
+                按该层级的键列（和时间）排序
+        """
+        if name != self.top and name not in self.levels:
+            raise ValueError(f"未知的层级: {name}")
+        depth = 0 if name == self.top else self.levels.index(name) + 1
+        keys = [name] if depth else []
+        time_mask = self.data[self.time].notna() if by_time else self.data[self.time].isna()
+        rows = self.data[(self.data[LEVEL_COLUMN] == name) & time_mask]
+        columns = keys + ([self.time] if by_time else []) + list(values or self.values)
+        return rows.sort_values(keys + ([self.time] if by_time else []), kind='stable')[columns] \
+            .reset_index(drop=True)
+
+
+class HierarchyRollup:
+    """
+    按层级（如 地级市 → 省份 → 区域 → 全国）× 时间汇总变量
+
+    只对原始数据做一次分组（最细层级 × 时间），更粗的层级和跨时间的合计都由这一份
+    最细层级的汇总再聚合得到，不需要对原始数据重复 groupby。
+
+    参数:
+        levels (list[str]): 层级键列，从粗到细，例如 ['区域', '省份', '地级市']；
+            细层级的值应当只属于一个粗层级的分组
+        time (str): 时间列，该列为空的行不参与汇总
+        top (str): 最高层级的名称
+    """
+    def __init__(self, levels: List[str], time: str = '年份', top: str = '全国'):
+        if not levels:
+            raise ValueError("levels 不能为空")
+        self.levels = list(levels)
+        self.time = time
+        self.top = top
+
+    def cube(self, data: pd.DataFrame, values: Union[List[str], Dict[str, str]]) -> RollupCube:
+        """
+        计算所有层级 × 时间（以及跨时间合计）的汇总
+
+        参数:
+            data (pd.DataFrame): 原始数据，需要包含层级键列、时间列和变量列
+            values: 变量列列表（均求和），或 {变量列: 'sum' | 'mean'}
+
+        返回:
+            RollupCube: 整洁格式的汇总立方体
+        """
+        aggregations = {column: 'sum' for column in values} if not isinstance(values, dict) else dict(values)
+        unknown = {how for how in aggregations.values() if how not in ROLLUP_AGGREGATIONS}
+        if unknown:
+            raise ValueError(f"不支持的汇总方式: {sorted(unknown)}")
+        missing = [column for column in self.levels + [self.time, *aggregations] if column not in data.columns]
+        if missing:
+            raise ValueError(f"以下列在数据中不存在: {missing}")
+
+        # 平均值列同时累计非空个数
+        means = [column for column, how in aggregations.items() if how == 'mean']
+        counts = {column: f'__count_{column}' for column in means}
+        data = data[data[self.time].notna()]
+        frame = data[self.levels + [self.time] + list(aggregations)].assign(
+            **{counts[column]: data[column].notna().astype(np.int64) for column in means}
+        )
+        # 唯一一次对原始数据的分组：最细层级 × 时间
+        summed = list(aggregations) + list(counts.values())
+        base = frame.groupby(self.levels + [self.time], sort=True, dropna=False)[summed].sum().reset_index()
+
+        parts = []
+        for depth in range(len(self.levels), -1, -1):
+            keys = self.levels[:depth]
+            name = self.levels[depth - 1] if depth else self.top
+            for by_time in (True, False):
+                group_keys = keys + ([self.time] if by_time else [])
+                if group_keys:
+                    part = base.groupby(group_keys, sort=True, dropna=False)[summed].sum().reset_index()
+                else:
+                    part = base[summed].sum().to_frame().T
+                part.insert(0, LEVEL_COLUMN, name)
+                parts.append(part)
+
+        cube = pd.concat(parts, ignore_index=True)
+        cube = cube.reindex(columns=[LEVEL_COLUMN] + self.levels + [self.time] + summed)
+        for column in means:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cube[column] = cube[column] / cube[counts[column]].where(cube[counts[column]] > 0)
+        cube = cube.drop(columns=list(counts.values()))
+        if pd.api.types.is_integer_dtype(data[self.time]):
+            cube[self.time] = cube[self.time].astype('Int64')
+        return RollupCube(cube, self.levels, self.time, self.top, list(aggregations))
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+# Excel 公式错误值，单元格以文本形式保存这些值时整列会被解析为 object
+EXCEL_ERROR_TOKENS: Tuple[str, ...] = (
+    '#DIV/0!', '#N/A', '#NAME?', '#NULL!', '#NUM!', '#REF!', '#VALUE!',
+    '#GETTING_DATA', '#SPILL!', '#CALC!',
+)
+
+# 数值类型，转换后缺失值为 NaN（整数列有缺失值时改为 float64）；
+# 'number' 表示保留 pd.to_numeric 得到的类型，整数列仍为整数
+NUMERIC_DTYPES = ('number', 'float64', 'float32', 'int64', 'int32')
+
+
+@dataclass
+class ColumnSpec:
+    """
+    单列的读取规则
+
+    参数:
+        dtype: 目标类型，数值类型（number、float64、float32、int64、int32）或 'string'、'category'
+        errors: 视为缺失值的错误文本，默认为所有 Excel 错误值
+        unit: 单位，只用于说明和转换报告
+        fill_value: 转换后缺失值的填充值，为None时保留 NaN
+    """
+    dtype: str = 'float64'
+    errors: Tuple[str, ...] = EXCEL_ERROR_TOKENS
+    unit: Optional[str] = None
+    fill_value: Optional[float] = None
+
+    @property
+    def numeric(self) -> bool:
+        return self.dtype in NUMERIC_DTYPES
+
+
+@dataclass
+class CoercionReport:
+    """
+    按 schema 转换后的统计
+
+    参数:
+        rows: 每列一条记录：列名、类型、单位、错误值个数、无法解析的个数、填充个数
+    """
+    rows: List[Dict] = field(default_factory=list)
+
+    @property
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows, columns=['列', '类型', '单位', '错误值', '无法解析', '填充'])
+
+    @property
+    def coerced(self) -> int:
+        """转换为缺失值的单元格总数"""
+        return sum(row['错误值'] + row['无法解析'] for row in self.rows)
+
+    def summary(self) -> str:
+        changed = [row for row in self.rows if row['错误值'] or row['无法解析'] or row['填充']]
+        lines = [f"按schema转换 {len(self.rows)} 列，{self.coerced} 个单元格转换为缺失值"]
+        for row in changed:
+            unit = f" ({row['单位']})" if row['单位'] else ''
+            lines.append(f"  {row['列']}{unit}: 错误值 {row['错误值']}，无法解析 {row['无法解析']}，"
+                         f"填充 {row['填充']}")
+        return '\n'.join(lines)
+
+
+class IngestSchema:
+    """
+    sheet的列类型声明，读取后一次性把每列转换为声明的类型
+
+    数值列中的错误文本（如 #DIV/0!）用 isin 整列匹配后置为 NaN，其余值用
+    pd.to_numeric 一次转换，结果直接是 float/int 数组而不是 object 列。
+
+    参数:
+        columns (dict[列名, ColumnSpec]): 显式声明的列
+        numeric_default (ColumnSpec): 未声明的列中，除错误文本外全部可以解析为
+            数值的列按该规则转换；为None时未声明的列保持原样
+    """
+    def __init__(self, columns: Optional[Dict[Hashable, ColumnSpec]] = None,
+                 numeric_default: Optional[ColumnSpec] = None):
+        self.columns: Dict[Hashable, ColumnSpec] = dict(columns or {})
+        self.numeric_default = numeric_default
+
+    def units(self) -> Dict[Hashable, str]:
+        """返回声明了单位的列"""
+        return {name: spec.unit for name, spec in self.columns.items() if spec.unit}
+
+    def apply(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, CoercionReport]:
+        """
+        按声明转换各列
+
+        参数:
+            data (pd.DataFrame): 读取得到的数据，不会被修改
+
+        返回:
+            (pd.DataFrame, CoercionReport): 转换后的新DataFrame和转换统计
+        """
+        missing = [name for name in self.columns if name not in data.columns]
+        if missing:
+            raise ValueError(f"以下列在sheet中不存在: {missing}")
+
+        report = CoercionReport()
+        converted = {}
+        for name in data.columns:
+            spec = self.columns.get(name)
+            if spec is not None:
+                converted[name] = self._convert(data[name], name, spec, report, strict=True)
+            elif self.numeric_default is not None:
+                result = self._convert(data[name], name, self.numeric_default, report, strict=False)
+                if result is not None:
+                    converted[name] = result
+        data = data.copy()
+        for name, values in converted.items():
+            data[name] = values
+        return data, report
+
+    @staticmethod
+    def _convert(series: pd.Series, name: Hashable, spec: ColumnSpec, report: CoercionReport,
+                 strict: bool) -> Optional[pd.Series]:
+        """
+        转换单列；strict 为False时只处理数值列和文本列，存在错误文本以外无法解析的值
+        或者整列为空文本时返回None（保持原样）
+        """
+        if not strict and (pd.api.types.is_bool_dtype(series) or
+                           not (pd.api.types.is_numeric_dtype(series) or
+                                pd.api.types.is_object_dtype(series) or
+                                pd.api.types.is_string_dtype(series))):
+            return None
+
+        # 数值类型的列不可能含有错误文本
+        errors = None if pd.api.types.is_numeric_dtype(series) else series.isin(spec.errors)
+        n_errors = int(errors.sum()) if errors is not None else 0
+
+        if spec.numeric:
+            values = series.mask(errors, np.nan) if n_errors else series
+            numbers = pd.to_numeric(values, errors='coerce')
+            invalid = int((numbers.isna() & values.notna() & (values != '')).sum())
+            if not strict and (invalid or (errors is not None and not n_errors and not numbers.notna().any())):
+                return None
+            filled = 0
+            if spec.fill_value is not None:
+                filled = int(numbers.isna().sum())
+                numbers = numbers.fillna(spec.fill_value)
+            dtype = spec.dtype
+            if dtype.startswith('int') and numbers.isna().any():
+                dtype = 'float64'
+            result = numbers if dtype == 'number' else numbers.astype(dtype)
+        else:
+            if not strict:
+                return None
+            values = series.mask(errors, np.nan) if n_errors else series
+            invalid = 0
+            filled = 0
+            if spec.fill_value is not None:
+                filled = int(values.isna().sum())
+                values = values.fillna(spec.fill_value)
+            result = values.astype(spec.dtype)
+
+        report.rows.append({'列': name, '类型': str(result.dtype), '单位': spec.unit,
+                            '错误值': n_errors, '无法解析': invalid, '填充': filled})
+        return result
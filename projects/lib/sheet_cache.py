@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow 是可选依赖，缺失时缓存自动关闭
+    pa = None
+    feather = None
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '.sheet_cache'
+)
+
+# 写入Arrow schema元数据时使用的键
+_META_SOURCE = b'sheet_cache.source'
+_META_SHEET = b'sheet_cache.sheet'
+_META_COLUMNS = b'sheet_cache.columns'
+_META_CREATED = b'sheet_cache.created'
+
+
+class SheetCache:
+    """
+    Excel sheet的列式缓存（Arrow IPC / Feather格式）
+
+    每个 (工作簿, sheet) 第一次解析后写入缓存目录，文件名由工作簿内容的哈希
+    和sheet名称决定；工作簿内容不变时，之后的读取直接加载列式文件，不再解析xlsx。
+
+    参数:
+        cache_dir (str): 缓存目录
+        memory_map (bool): 加载时是否使用内存映射，默认为True
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, memory_map: bool = True):
+        self.cache_dir = cache_dir
+        self.memory_map = memory_map
+        self.enabled = pa is not None
+        self._digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    # ---------- 路径与哈希 ----------
+    def file_digest(self, file_path: str) -> str:
+        """
+        计算工作簿内容的哈希，文件的 (mtime, size) 不变时复用上次的结果
+
+        参数:
+            file_path (str): 工作簿路径
+
+        返回:
+            str: sha256 十六进制字符串
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(key)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._digests.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        sha = hashlib.sha256()
+        with open(key, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self._digests[key] = (signature, digest)
+        return digest
+
+    def _entry_path(self, digest: str, sheet_name: str) -> str:
+        sheet_key = hashlib.sha1(str(sheet_name).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}-{sheet_key}.arrow")
+
+    def _manifest_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _atomic_write(self, path: str, write) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # ---------- sheet名称 ----------
+    def sheet_names(self, file_path: str) -> Optional[List[str]]:
+        """返回缓存中记录的sheet名称列表，未缓存时返回None"""
+        if not self.enabled:
+            return None
+        path = self._manifest_path(self.file_digest(file_path))
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['sheet_names']
+
+    def store_sheet_names(self, file_path: str, sheet_names: List[str]) -> None:
+        """记录工作簿的sheet名称列表"""
+        if not self.enabled:
+            return
+        manifest = {'source': os.path.abspath(file_path), 'sheet_names': list(sheet_names)}
+
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+
+        self._atomic_write(self._manifest_path(self.file_digest(file_path)), write)
+
+    # ---------- sheet数据 ----------
+    def load(self, file_path: str, sheet_name: str, memory_map: Optional[bool] = None,
+             columns: Optional[List] = None) -> Optional[pd.DataFrame]:
+        """
+        从缓存加载sheet
+
+        参数:
+            file_path (str): 工作簿路径
+            sheet_name (str): sheet名称
+            memory_map (bool): 是否使用内存映射，默认使用实例配置
+            columns (list): 只加载这些列（原始列名），为None时加载全部列
+
+        返回:
+            pd.DataFrame: 缓存命中时返回数据，否则返回None
+        """
+        table = self.load_table(file_path, sheet_name, memory_map)
+        if table is None:
+            return None
+        return self.to_pandas(table, columns)
+
+    def load_table(self, file_path: str, sheet_name: str, memory_map: Optional[bool] = None):
+        """
+        从缓存加载sheet的Arrow表（列名为原始列名的字符串形式）
+
+        返回:
+            pyarrow.Table: 缓存命中时返回Arrow表，否则返回None
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(self.file_digest(file_path), sheet_name)
+        if not os.path.exists(path):
+            return None
+        if memory_map is None:
+            memory_map = self.memory_map
+        return feather.read_table(path, memory_map=memory_map)
+
+    def store(self, file_path: str, sheet_name: str, data: pd.DataFrame) -> bool:
+        """
+        将sheet写入缓存
+
+        参数:
+            file_path (str): 工作簿路径
+            sheet_name (str): sheet名称
+            data (pd.DataFrame): 解析后的sheet数据
+
+        返回:
+            bool: 是否写入成功（含混合类型列等无法转换为Arrow的数据时返回False）
+        """
+        if not self.enabled:
+            return False
+
+        # Arrow要求列名为字符串，原始列名（如宽表中的年份整数）记录在元数据中
+        columns = [[type(col).__name__, col if isinstance(col, (int, float, str)) else str(col)]
+                   for col in data.columns]
+        frame = data.copy(deep=False)
+        frame.columns = [f'__col_{i}' for i in range(len(data.columns))]
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            print(f"sheet '{sheet_name}' 无法写入列式缓存: {e}")
+            return False
+
+        table = table.rename_columns([str(col[1]) for col in columns])
+        table = table.replace_schema_metadata({
+            _META_SOURCE: os.path.abspath(file_path).encode('utf-8'),
+            _META_SHEET: str(sheet_name).encode('utf-8'),
+            _META_COLUMNS: json.dumps(columns, ensure_ascii=False).encode('utf-8'),
+            _META_CREATED: str(time.time()).encode('utf-8'),
+        })
+        path = self._entry_path(self.file_digest(file_path), sheet_name)
+        self._atomic_write(path, lambda tmp_path: feather.write_feather(table, tmp_path, compression='uncompressed'))
+        return True
+
+    @staticmethod
+    def to_pandas(table, columns: Optional[List] = None) -> pd.DataFrame:
+        """
+        将缓存中的Arrow表转换为DataFrame，并恢复原始列名
+
+        参数:
+            table (pyarrow.Table): load_table 返回的表
+            columns (list): 只转换这些列（原始列名），为None时转换全部列
+
+        返回:
+            pd.DataFrame: 数据
+        """
+        metadata = table.schema.metadata or {}
+        if _META_COLUMNS in metadata:
+            labels = [value for _, value in json.loads(metadata[_META_COLUMNS].decode('utf-8'))]
+        else:
+            labels = list(table.column_names)
+
+        if columns is not None:
+            # 列投影在Arrow层完成，未选中的列不会转换为pandas对象
+            missing = [col for col in columns if col not in labels]
+            if missing:
+                raise ValueError(f"以下列在sheet中不存在: {missing}")
+            positions = [labels.index(col) for col in columns]
+            table = table.select(positions)
+            labels = list(columns)
+
+        data = table.to_pandas(split_blocks=True)
+        data.columns = labels
+        return data
+
+    # ---------- 管理 ----------
+    def entries(self) -> List[dict]:
+        """
+        列出缓存中的所有sheet
+
+        返回:
+            list[dict]: 每个缓存文件的来源、sheet、大小、是否过期等信息
+        """
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.cache_dir)):
+            if not name.endswith('.arrow'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            with pa.memory_map(path) as source:
+                schema = pa.ipc.open_file(source).schema
+            metadata = schema.metadata or {}
+            source_path = metadata.get(_META_SOURCE, b'').decode('utf-8')
+            digest = name.split('-', 1)[0]
+            stale = not os.path.exists(source_path) or self.file_digest(source_path) != digest
+            result.append({
+                'path': path,
+                'source': source_path,
+                'sheet': metadata.get(_META_SHEET, b'').decode('utf-8'),
+                'columns': len(schema),
+                'size': os.path.getsize(path),
+                'stale': stale,
+            })
+        return result
+
+    def warm(self, file_path: str, sheet_names: Optional[List[str]] = None) -> List[str]:
+        """
+        预先解析并缓存工作簿中的sheet
+
+        参数:
+            file_path (str): 工作簿路径
+            sheet_names (list[str]): 需要缓存的sheet，为None时缓存所有sheet
+
+        返回:
+            list[str]: 成功写入缓存的sheet名称
+        """
+        from lib.workbook import workbook_registry
+
+        if sheet_names is None:
+            sheet_names = workbook_registry.sheet_names(file_path)
+        warmed = []
+        for sheet_name in sheet_names:
+            workbook_registry.read_sheet(file_path, sheet_name, copy=False)
+            if os.path.exists(self._entry_path(self.file_digest(file_path), sheet_name)):
+                warmed.append(sheet_name)
+        return warmed
+
+    def purge(self, file_path: Optional[str] = None, stale_only: bool = False) -> int:
+        """
+        删除缓存文件
+
+        参数:
+            file_path (str): 只删除该工作簿的缓存，为None时处理全部缓存
+            stale_only (bool): 只删除来源文件已变化或不存在的缓存
+
+        返回:
+            int: 删除的文件数量
+        """
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return 0
+        source = os.path.abspath(file_path) if file_path else None
+
+        def should_remove(entry_source: str, digest: str) -> bool:
+            if source is not None and entry_source != source:
+                return False
+            if stale_only:
+                return not os.path.exists(entry_source) or self.file_digest(entry_source) != digest
+            return True
+
+        removed = 0
+        for entry in self.entries():
+            digest = os.path.basename(entry['path']).split('-', 1)[0]
+            if should_remove(entry['source'], digest):
+                os.remove(entry['path'])
+                removed += 1
+
+        # sheet名称清单按同样的规则清理
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            manifest_path = os.path.join(self.cache_dir, name)
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest_source = json.load(f).get('source', '')
+            if should_remove(manifest_source, name[:-len('.json')]):
+                os.remove(manifest_path)
+                removed += 1
+        return removed
+
+
+sheet_cache = SheetCache()
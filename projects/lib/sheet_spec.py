@@ -0,0 +1,217 @@
+import os
+import tomllib
+from dataclasses import dataclass, fields
+from typing import List, Optional, Union
+from lib.cleaner import DataCleaner, LongFormatParams
+from lib.city_index import default_city_index
+from lib.workbook import RowFilter
+
+DEFAULT_SPEC_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sheet_specs.toml')
+
+# 支持的重复行合并方式
+DUPLICATE_AGGREGATIONS = ('mean',)
+
+
+@dataclass(frozen=True)
+class MeltSpec:
+    """
+    宽表转长表的设置，年份列为样本年份
+
+    参数:
+        id_vars: 标识列
+        value_name: 值列名
+    """
+    id_vars: tuple
+    value_name: str
+
+
+@dataclass(frozen=True)
+class SheetSpec:
+    """
+    数据清理工作簿中一个sheet的清理规则，见 sheet_specs.toml 中的字段说明
+
+    参数:
+        name: 步骤名称
+        sheet: sheet名称
+        unit: 单位（城市或省份）列名
+        time: 年份列名
+        units: 样本单位在 Constant 中的列表名
+        normalize: 是否把单位列统一为标准城市名
+        pushdown: 读取时是否只加载样本的行（宽表还有样本年份的列）
+        melt: 宽表转长表的设置
+        duplicates: 重复行的合并方式
+        panel: 是否对齐到完整的面板
+        interpolate: 插值的列，'*' 为除单位、年份和 interpolate_exclude 以外的所有列
+        interpolate_exclude: interpolate 为 '*' 时不插值的列
+        did: 是否生成DID变量
+        handler: 单独处理该sheet的函数名称
+        enabled: 是否处理该sheet
+    """
+    name: str
+    sheet: str
+    unit: str
+    time: str
+    units: str = 'cities'
+    normalize: bool = True
+    pushdown: bool = False
+    melt: Optional[MeltSpec] = None
+    duplicates: Optional[str] = None
+    panel: bool = False
+    interpolate: Union[str, tuple] = ()
+    interpolate_exclude: tuple = ()
+    did: bool = False
+    handler: Optional[str] = None
+    enabled: bool = True
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> 'SheetSpec':
+        """
+        从配置项构建规则
+
+        参数:
+            entry (dict): sheet_specs.toml 中的一个 [[sheet]]
+
+        返回:
+            SheetSpec: 清理规则
+        """
+        label = entry.get('name', entry.get('sheet', '?'))
+        known = {f.name for f in fields(cls)}
+        unknown = set(entry) - known
+        if unknown:
+            raise ValueError(f"sheet规则 '{label}' 中有未知的字段: {sorted(unknown)}")
+        missing = [key for key in ('name', 'sheet', 'unit', 'time') if key not in entry]
+        if missing:
+            raise ValueError(f"sheet规则 '{label}' 缺少字段: {missing}")
+
+        values = dict(entry)
+        melt = values.get('melt')
+        if melt is not None:
+            if set(melt) != {'id_vars', 'value_name'}:
+                raise ValueError(f"sheet规则 '{label}' 的 melt 需要且只能包含 id_vars 和 value_name")
+            values['melt'] = MeltSpec(tuple(melt['id_vars']), melt['value_name'])
+        if values.get('duplicates') not in (None,) + DUPLICATE_AGGREGATIONS:
+            raise ValueError(f"sheet规则 '{label}' 的 duplicates 只支持 {DUPLICATE_AGGREGATIONS}")
+        interpolate = values.get('interpolate', ())
+        if isinstance(interpolate, str):
+            if interpolate != '*':
+                raise ValueError(f"sheet规则 '{label}' 的 interpolate 应为列名列表或 '*'")
+        else:
+            values['interpolate'] = tuple(interpolate)
+        values['interpolate_exclude'] = tuple(values.get('interpolate_exclude', ()))
+        return cls(**values)
+
+    def sample_units(self) -> list:
+        """Constant 中的样本单位列表"""
+        from const import Constant
+        units = getattr(Constant, self.units, None)
+        if not isinstance(units, list):
+            raise ValueError(f"sheet规则 '{self.name}' 的 units '{self.units}' 不是 Constant 中的列表")
+        return units
+
+    def clean(self, file_name: str, units: list, years: list) -> DataCleaner:
+        """
+        读取并清理sheet
+
+        参数:
+            file_name (str): 工作簿路径
+            units (list): 样本单位
+            years (list): 样本年份
+
+        返回:
+            DataCleaner: 清理后的数据，调用 close_file_and_save 写回
+        """
+        transform = default_city_index().canonical if self.normalize else None
+        long_format_params = None
+        columns = None
+        row_filters = None
+        if self.melt is not None:
+            long_format_params = LongFormatParams(
+                id_vars=list(self.melt.id_vars),
+                value_vars=years,
+                var_name=self.time,
+                value_name=self.melt.value_name,
+            )
+            if self.pushdown:
+                # 只读取样本单位的行和样本年份的列
+                columns = list(self.melt.id_vars) + list(years)
+                row_filters = [RowFilter(self.unit, units, transform=transform)]
+        elif self.pushdown:
+            row_filters = [RowFilter(self.unit, units, transform=transform), RowFilter(self.time, years)]
+
+        cleaner = DataCleaner(
+            file_name,
+            sheet_name=self.sheet,
+            is_long_format=self.melt is None,
+            long_format_params=long_format_params,
+            columns=columns,
+            row_filters=row_filters,
+        )
+
+        if self.normalize:
+            cleaner.normalize_city_column(self.unit)
+        cleaner.clean_data_keep_values(self.unit, units)
+        cleaner.clean_data_keep_values(self.time, years)
+
+        if self.duplicates is not None:
+            value_columns = [col for col in cleaner.data.columns if col not in [self.unit, self.time]]
+            cleaner.data = cleaner.data.groupby([self.unit, self.time])[value_columns].agg(self.duplicates).reset_index()
+
+        if self.panel:
+            # 对齐后的数据已按面板的单位和年份顺序排列
+            cleaner.create_panel_dataset([self.unit, self.time], {self.unit: units, self.time: years})
+        else:
+            cleaner.rearrange_data(
+                sort_priority=[self.unit, self.time],
+                sort_orders={self.unit: units, self.time: years}
+            )
+
+        if self.interpolate == '*':
+            excluded = {self.unit, self.time, *self.interpolate_exclude}
+            interpolate = [col for col in cleaner.data.columns if col not in excluded]
+        else:
+            interpolate = list(self.interpolate)
+        if interpolate:
+            cleaner.interpolate_many(interpolate, self.unit, self.time)
+
+        if self.did:
+            cleaner.create_did_variable(self.time, self.unit)
+        return cleaner
+
+
+def load_sheet_specs(path: str = DEFAULT_SPEC_FILE, include_disabled: bool = False) -> List[SheetSpec]:
+    """
+    读取sheet清理规则
+
+    参数:
+        path (str): TOML 配置文件路径
+        include_disabled (bool): 是否包含 enabled = false 的规则
+
+    返回:
+        list[SheetSpec]: 按配置文件中的顺序排列的规则
+    """
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+    specs = [SheetSpec.from_dict(entry) for entry in config.get('sheet', [])]
+
+    for key in ('name', 'sheet'):
+        seen = set()
+        for spec in specs:
+            value = getattr(spec, key)
+            if value in seen:
+                raise ValueError(f"{path} 中的 {key} '{value}' 重复")
+            seen.add(value)
+    return [spec for spec in specs if include_disabled or spec.enabled]
+
+
+def process_sheet_spec(file_name: str, spec: SheetSpec, years: list, output_file: Optional[str] = None) -> None:
+    """
+    按规则清理一个sheet，结果通过 close_file_and_save 暂存到写入会话（没有会话时直接写入）
+
+    参数:
+        file_name (str): 工作簿路径
+        spec (SheetSpec): 清理规则
+        years (list): 样本年份
+        output_file (str): 写入的工作簿，默认写回 file_name
+    """
+    spec.clean(file_name, spec.sample_units(), years).close_file_and_save(output_file)
+
@@ -0,0 +1,236 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from lib.sheet_cache import sheet_cache
+from lib.workbook import workbook_registry
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_DIR, 'data', '.pipeline_cache')
+
+# 步骤依赖的代码：main.py 等入口、lib 中的库代码和 sheet 规则配置，
+# 其中任一文件变化都会使所有步骤的缓存失效
+CODE_PATTERNS = ('*.py', 'lib/*.py', '*.toml')
+
+_MANIFEST = 'manifest.json'
+_SHEETS = 'sheets.pkl'
+_FILES = 'files'
+
+
+def frame_digest(data: pd.DataFrame) -> str:
+    """DataFrame 内容（列名、类型和所有值）的哈希"""
+    sha = hashlib.sha256()
+    sha.update(repr([(str(col), str(dtype)) for col, dtype in data.dtypes.items()]).encode('utf-8'))
+    sha.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def path_digest(path: str) -> str:
+    """文件内容的哈希；目录为其中所有文件的 (路径, 大小, 修改时间) 的哈希；不存在时为空字符串"""
+    if os.path.isfile(path):
+        return sheet_cache.file_digest(path)
+    if not os.path.isdir(path):
+        return ''
+    sha = hashlib.sha256()
+    for directory, _, names in sorted(os.walk(path)):
+        for name in sorted(names):
+            file_path = os.path.join(directory, name)
+            stat = os.stat(file_path)
+            sha.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    return sha.hexdigest()
+
+
+def code_digest(root: str = PROJECT_DIR, patterns: Tuple[str, ...] = CODE_PATTERNS) -> str:
+    """
+    代码文件内容的哈希
+
+    参数:
+        root (str): 项目目录
+        patterns (tuple[str]): 相对于 root 的文件通配符
+
+    返回:
+        str: sha256 十六进制字符串
+    """
+    paths = sorted({path for pattern in patterns for path in glob.glob(os.path.join(root, pattern))})
+    sha = hashlib.sha256()
+    for path in paths:
+        sha.update(f"{os.path.relpath(path, root)}:{sheet_cache.file_digest(path)}\n".encode('utf-8'))
+    return sha.hexdigest()
+
+
+class StepCache:
+    """
+    流水线步骤的产物缓存
+
+    步骤的指纹由输入数据（sheet按内容、文件按内容哈希）、参数、函数源码、
+    Step.version 以及 code_root 下所有代码文件（见 CODE_PATTERNS）的内容决定，
+    库代码或sheet规则变化时缓存随之失效。指纹不变时不再运行步骤，而是恢复上次运行的产物：
+    步骤直接写出的文件复制回原路径，暂存的sheet交给主进程写入，与真正运行一次的效果相同。
+
+    每个步骤的缓存位于 cache_dir/<步骤名>/<指纹>/，只保留最近的 keep 个。
+
+    参数:
+        cache_dir (str): 缓存目录
+        keep (int): 每个步骤保留的缓存个数
+        code_root (str): 计算代码哈希的项目目录
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, keep: int = 3, code_root: str = PROJECT_DIR):
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.code_root = code_root
+
+    def fingerprint(self, step) -> str:
+        """
+        计算步骤的指纹，需要在步骤运行之前调用（步骤可能原地修改输入的sheet）
+
+        参数:
+            step (Step): 流水线步骤
+
+        返回:
+            str: sha256 十六进制字符串
+        """
+        sha = hashlib.sha256()
+        try:
+            code = inspect.getsource(step.func)
+        except (OSError, TypeError):
+            code = step.func.__code__.co_code.hex()
+        sha.update(f"{step.func.__module__}.{step.func.__qualname__}\n{code}\n{step.version}\n".encode('utf-8'))
+        sha.update(code_digest(self.code_root).encode('utf-8'))
+        sha.update(pickle.dumps((step.args, sorted(step.kwargs.items()))))
+        sha.update(repr([str(artifact) for artifact in step.outputs]).encode('utf-8'))
+        for artifact in step.inputs:
+            if artifact.sheet is None:
+                digest = path_digest(artifact.path)
+            else:
+                # 读取结果留在进程内的工作簿注册表中，步骤随后读取同一个sheet时不再解析
+                digest = frame_digest(workbook_registry.read_sheet(artifact.path, artifact.sheet, copy=False))
+            sha.update(f"{artifact}:{digest}\n".encode('utf-8'))
+        return sha.hexdigest()
+
+    def _entry_dir(self, step, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, step.name, fingerprint)
+
+    def restore(self, step, fingerprint: str) -> Optional[Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]]]:
+        """
+        恢复缓存的产物
+
+        参数:
+            step (Step): 流水线步骤
+            fingerprint (str): fingerprint() 的结果
+
+        返回:
+            dict: 暂存的sheet（文件绝对路径 -> {sheet名称: (数据, 是否写入索引)}）；没有缓存时返回None
+        """
+        entry = self._entry_dir(step, fingerprint)
+        manifest_path = os.path.join(entry, _MANIFEST)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        outputs = [artifact.path for artifact in step.outputs if artifact.sheet is None]
+        for index, kind in manifest['files'].items():
+            source = os.path.join(entry, _FILES, index)
+            target = outputs[int(index)]
+            if kind == 'dir':
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+                shutil.copy2(source, target)
+
+        staged = {}
+        if manifest['sheets']:
+            with open(os.path.join(entry, _SHEETS), 'rb') as f:
+                sheets = pickle.load(f)
+            workbooks = step.workbooks
+            staged = {os.path.abspath(workbooks[int(index)]): value for index, value in sheets.items()}
+        os.utime(manifest_path)
+        return staged
+
+    def store(self, step, fingerprint: str, staged: Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]]) -> bool:
+        """
+        保存步骤的产物：声明为整个文件（或目录）的输出复制到缓存中，暂存的sheet序列化保存
+
+        参数:
+            step (Step): 流水线步骤
+            fingerprint (str): 运行前计算的指纹
+            staged (dict): 步骤暂存的sheet
+
+        返回:
+            bool: 是否写入缓存（步骤写入了未声明的工作簿时不缓存）
+        """
+        workbooks = [os.path.abspath(path) for path in step.workbooks]
+        undeclared = [path for path in staged if path not in workbooks]
+        if undeclared:
+            print(f"步骤 {step.name} 写入了未声明的工作簿 {undeclared}，不缓存")
+            return False
+
+        entry = self._entry_dir(step, fingerprint)
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(os.path.join(tmp_entry, _FILES))
+        try:
+            files = {}
+            outputs = [artifact.path for artifact in step.outputs if artifact.sheet is None]
+            for index, path in enumerate(outputs):
+                target = os.path.join(tmp_entry, _FILES, str(index))
+                if os.path.isdir(path):
+                    shutil.copytree(path, target)
+                    files[str(index)] = 'dir'
+                elif os.path.isfile(path):
+                    shutil.copy2(path, target)
+                    files[str(index)] = 'file'
+            if staged:
+                with open(os.path.join(tmp_entry, _SHEETS), 'wb') as f:
+                    pickle.dump({str(workbooks.index(path)): sheets for path, sheets in staged.items()}, f)
+            with open(os.path.join(tmp_entry, _MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump({'step': step.name, 'created': time.time(), 'files': files,
+                           'sheets': {str(workbooks.index(path)): list(sheets) for path, sheets in staged.items()}},
+                          f, ensure_ascii=False)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self._prune(step.name)
+        return True
+
+    def _prune(self, step_name: str) -> None:
+        # 只保留最近使用的 keep 个缓存
+        step_dir = os.path.join(self.cache_dir, step_name)
+        entries = []
+        for name in os.listdir(step_dir):
+            manifest_path = os.path.join(step_dir, name, _MANIFEST)
+            if os.path.exists(manifest_path):
+                entries.append((os.path.getmtime(manifest_path), name))
+        for _, name in sorted(entries, reverse=True)[self.keep:]:
+            shutil.rmtree(os.path.join(step_dir, name), ignore_errors=True)
+
+    def purge(self, step_names: Optional[List[str]] = None) -> int:
+        """
+        删除缓存
+
+        参数:
+            step_names (list[str]): 只删除这些步骤的缓存，为None时删除全部
+
+        返回:
+            int: 删除的缓存个数
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        for name in step_names or os.listdir(self.cache_dir):
+            step_dir = os.path.join(self.cache_dir, name)
+            if os.path.isdir(step_dir):
+                removed += sum(1 for entry in os.listdir(step_dir) if not entry.endswith('.tmp'))
+                shutil.rmtree(step_dir)
+        return removed
+
+
+step_cache = StepCache()
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+
+class CategoryTaxonomy:
+    """
+    原始类别到汇总类别的映射（一个原始类别可以属于多个汇总类别）
+
+    汇总时把 (行 × 原始类别) 的面积表和价值表分别乘以 (原始类别 × 汇总类别)
+    的0/1成员矩阵，一次得到所有汇总类别的总面积和总价值，再由此计算占比和
+    平均价格。
+
+    参数:
+        groups (dict[str, list[str]]): 汇总类别 -> 原始类别列表，顺序即输出顺序
+    """
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups: Dict[str, List[str]] = {name: list(members) for name, members in groups.items()}
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.groups)
+
+    def subset(self, names: Iterable[str]) -> 'CategoryTaxonomy':
+        """返回只包含指定汇总类别的分类"""
+        return CategoryTaxonomy({name: self.groups[name] for name in names})
+
+    def membership(self, categories: Iterable[str]) -> np.ndarray:
+        """
+        构建成员矩阵
+
+        参数:
+            categories: 原始类别（表格的列）
+
+        返回:
+            np.ndarray: (原始类别数, 汇总类别数) 的0/1矩阵
+        """
+        position = {category: i for i, category in enumerate(categories)}
+        matrix = np.zeros((len(position), len(self.groups)))
+        for j, members in enumerate(self.groups.values()):
+            rows = [position[member] for member in set(members) if member in position]
+            matrix[rows, j] = 1.0
+        return matrix
+
+    def rollup(self, area: pd.DataFrame, value: pd.DataFrame,
+               total_area: Optional[pd.Series] = None) -> pd.DataFrame:
+        """
+        按汇总类别计算总面积、总价值、占比和平均价格
+
+        参数:
+            area (pd.DataFrame): 行 × 原始类别的面积表
+            value (pd.DataFrame): 行 × 原始类别的价值表，列可以与 area 不同
+            total_area (pd.Series): 每行的总面积，用于计算占比；为None时不计算占比
+
+        返回:
+            pd.DataFrame: 每个汇总类别依次为 {类别}_总面积、{类别}_总价值，
+                之后是 {类别}_占比（如果计算）和 {类别}_平均价格，索引与 area 相同
+        """
+        value = value.reindex(index=area.index)
+        area_sum = area.fillna(0).to_numpy(dtype=float) @ self.membership(area.columns)
+        value_sum = value.fillna(0).to_numpy(dtype=float) @ self.membership(value.columns)
+
+        columns = {}
+        for j, name in enumerate(self.groups):
+            columns[f'{name}_总面积'] = area_sum[:, j]
+            columns[f'{name}_总价值'] = value_sum[:, j]
+        result = pd.DataFrame(columns, index=area.index)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if total_area is not None:
+                total = total_area.reindex(area.index).to_numpy(dtype=float)
+                for j, name in enumerate(self.groups):
+                    result[f'{name}_占比'] = _ratio(area_sum[:, j], total, 4)
+            for j, name in enumerate(self.groups):
+                result[f'{name}_平均价格'] = _ratio(value_sum[:, j], area_sum[:, j], 2)
+        return result
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, decimals: int) -> np.ndarray:
+    # 与 (a / b).replace([inf, -inf], 0).fillna(0).round(n) 相同
+    ratio = numerator / denominator
+    ratio[~np.isfinite(ratio)] = 0
+    return np.round(ratio, decimals)
+
+
+# 制造业（GB/T 4754-2002 门类C）
+MANUFACTURING = [
+    "农副食品加工业", "食品制造业", "饮料制造业", "烟草制品业", "纺织业",
+    "纺织服装、鞋、帽制造业", "皮革、毛皮、羽毛（绒）及其制造业", "木材加工及木、竹、藤、棕、草制品业",
+    "家具制造业", "造纸及纸质品业", "印刷业和记录媒体的复制", "文教体育用品制造业",
+    "石油加工、炼焦及核燃料加工业", "化学原料及化学制品制造业", "医药制造业", "化学纤维制造业",
+    "橡胶制品业", "塑料制品业", "非金属矿物制品业", "黑色金属冶炼及压延加工业",
+    "有色金属冶炼及压延加工业", "金属制品业", "通用设备制造业", "专用设备制造业",
+    "交通运输设备制造业", "电气机械及器材制造业", "仪器仪表及文化、办公用机械制造业",
+    "通信设备、计算机及其他电子设备制造业", "废弃资源和废旧材料回收加工业"
+]
+
+REAL_ESTATE = ["房地产业"]
+
+HIGH_TECH = [
+    "计算机服务业", "软件业", "电信和其他信息传输服务业",
+    "通信设备、计算机及其他电子设备制造业", "研究与试验发展",
+    "科技交流和推广服务业", "专业技术服务业"
+]
+
+PRODUCER_SERVICES = [
+    "道路运输业", "铁路运输业", "航空运输业", "管道运输业",
+    "水上运输业", "仓储业", "邮政业", "银行业", "保险业",
+    "证券业", "商务服务业", "租赁业", "科技交流和推广服务业",
+    "环境管理业", "水利管理业"
+]
+
+CONSUMER_SERVICES = [
+    "餐饮业", "零售业", "住宿业", "居民服务业", "教育业",
+    "卫生", "社会保障业", "社会福利业", "娱乐业", "文化艺术业",
+    "广播、电视、电影和音像业", "体育", "公共设施管理业"
+]
+
+# 第二产业：采矿业，制造业，电力、燃气及水的生产和供应业，建筑业（GB/T 4754-2002 门类B-E）
+SECONDARY_INDUSTRY = [
+    "煤炭开采和洗选业", "石油和天然气开采业", "黑色金属矿采选业", "有色金属矿采选业",
+    "非金属矿采选业", "其他采矿业",
+    *MANUFACTURING, "工艺品及其他制造业",
+    "电力、热力的生产和供应业", "燃气生产和供应业", "水的生产和供应业",
+    "房屋和土木工程建筑业", "建筑安装业", "建筑装饰业", "其他建筑业"
+]
+
+# 第三产业：除农、林、牧、渔业和第二产业以外的其他行业（GB/T 4754-2002 门类F-T）
+TERTIARY_INDUSTRY = [
+    "铁路运输业", "道路运输业", "城市公共交通业", "水上运输业", "航空运输业", "管道运输业",
+    "装卸搬运和其他运输服务业", "仓储业", "邮政业",
+    "电信和其他信息传输服务业", "计算机服务业", "软件业",
+    "批发业", "零售业", "住宿业", "餐饮业",
+    "银行业", "证券业", "保险业", "其他金融活动", "房地产业",
+    "租赁业", "商务服务业",
+    "研究与试验发展", "专业技术服务业", "科技交流和推广服务业", "地质勘查业",
+    "水利管理业", "环境管理业", "公共设施管理业",
+    "居民服务业", "其他服务业", "教育", "教育业",
+    "卫生", "社会保障业", "社会福利业",
+    "新闻出版业", "广播、电视、电影和音像业", "文化艺术业", "体育", "娱乐业",
+    "中国共产党机关", "国家机构", "人民政协和民主党派", "群众团体、社会团体和宗教组织",
+    "基层群众自治组织", "国际组织"
+]
+
+# 行业分类汇总
+INDUSTRY_TAXONOMY = CategoryTaxonomy({
+    '制造业': MANUFACTURING,
+    '房地产业': REAL_ESTATE,
+    '高科技产业': HIGH_TECH,
+    '生产性服务业': PRODUCER_SERVICES,
+    '消费性服务业': CONSUMER_SERVICES,
+    '第二产业': SECONDARY_INDUSTRY,
+    '第三产业': TERTIARY_INDUSTRY,
+})
+
+# 土地用途汇总
+LAND_USE_TAXONOMY = CategoryTaxonomy({
+    '商住用地': [
+        '城镇住宅-普通商品住房用地', '城镇住宅-经济适用住房用地', '城镇住宅-公共租赁住房用地',
+        '城镇住宅-用于安置的商品住房用地 ', '城镇住宅-共有产权住房用地', '保障性租赁住房',
+        '旅馆用地', '商务金融用地', '零售商业用地', '批发市场用地', '餐饮用地', '娱乐用地',
+        '其他普通商品住房用地', '中低价位、中小套型普通商品住房用地', '经济适用住房用地',
+        '商服用地', '住宿餐饮用地', '廉租住房用地', '其他住房用地', '高档住宅用地',
+        '公共租赁住房用地', '住宅用地', '城镇住宅-租赁型商品住房用地', '批发零售用地'
+    ],
+    '工业用地': [
+        '工业用地', '仓储用地', '采矿用地', '工矿仓储用地'
+    ],
+})
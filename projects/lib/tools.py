@@ -1,7 +1,11 @@
 import pandas as pd
+import os
 import shutil
 import time
 from functools import wraps
+from lib.city_index import default_city_index
+from lib.workbook import resolve_alias, workbook_registry
+from lib.writer import WriteSession
 
 def timeit(func):
     @wraps(func)
@@ -26,14 +30,28 @@ class Tools:
         if city1 == city2:
             return True
 
+        # 两个名称都能匹配到标准城市时按城市ID比较（处理后缀和历史更名）
+        city_index = default_city_index()
+        id1, id2 = city_index.resolve(city1), city_index.resolve(city2)
+        if id1 >= 0 and id2 >= 0:
+            return id1 == id2
+
         city1 = city1.replace('市', '')
         city2 = city2.replace('市', '')
         return city1 == city2
 
+    @staticmethod
+    def _read_sheet(filename: str, sheetname: str, session: WriteSession = None) -> pd.DataFrame:
+        if session is not None and session.has_sheet(sheetname):
+            return session.read_sheet(sheetname)
+        return workbook_registry.read_sheet(filename, sheetname)
+
     @staticmethod
     def get_first_valid_column(filename: str, sheetname: str, column_list: list[str]) -> str:
         """
         返回Excel文件中指定sheet的DataFrame中第一个在给定列表中存在的列名
+
+        只读取sheet的表头，不解析整个sheet
         
         参数:
             filename (str): Excel文件路径
@@ -43,14 +61,12 @@ class Tools:
         返回:
             str: 第一个匹配的列名，如果没有匹配则返回空字符串
         """
-        df = pd.read_excel(filename, sheet_name=sheetname)
-        for col in column_list:
-            if col in df.columns:
-                return col
-        return ""
+        column = workbook_registry.probe_schema(filename, sheetname).resolve(column_list)
+        return "" if column is None else column
     
     @staticmethod
-    def clean_column_data(filename: str, sheetname: str, column_name: str, remove_str: str) -> None:
+    def clean_column_data(filename: str, sheetname: str, column_name: str, remove_str: str,
+                          session: WriteSession = None) -> None:
         """
         对Excel文件中指定列的所有数据去掉指定字符串
         
@@ -59,9 +75,12 @@ class Tools:
             sheetname (str): sheet名称
             column_name (str): 需要处理的列名
             remove_str (str): 需要去掉的字符串
+            session (WriteSession): 写入会话，为None时使用该文件当前激活的会话（如果有）
         """
+        session = session or WriteSession.active_for(filename)
+
         # 读取数据
-        df = pd.read_excel(filename, sheet_name=sheetname)
+        df = Tools._read_sheet(filename, sheetname, session)
         
         # 检查列是否存在
         if column_name not in df.columns:
@@ -71,11 +90,16 @@ class Tools:
         df[column_name] = df[column_name].astype(str).apply(lambda x: x.replace(remove_str, ''))
         
         # 写回Excel文件
+        if session is not None:
+            session.stage(sheetname, df)
+            return
         with pd.ExcelWriter(filename, mode='a', if_sheet_exists='replace') as writer:
             df.to_excel(writer, sheet_name=sheetname, index=False)
+        workbook_registry.invalidate(filename)
 
     @staticmethod
-    def rearrange_data(filename: str, sheet_name: str, sort_priority: list[str], sort_orders: dict[str, list]) -> None:
+    def rearrange_data(filename: str, sheet_name: str, sort_priority: list[str], sort_orders: dict[str, list],
+                       session: WriteSession = None) -> None:
         """
         对 Excel 表格数据按指定优先级和顺序进行排序，并覆盖写入到同一文件。
 
@@ -85,13 +109,15 @@ class Tools:
             sort_priority (list[str]): 排序优先级列表，如 ['city', 'year']
             sort_orders (dict[str, list]): 各字段的具体排序顺序，
                                            如 {'city': ['北京', '上海'], 'year': [2018, 2019]}。
+            session (WriteSession): 写入会话，为None时使用该文件当前激活的会话（如果有）
         
         返回:
             无，操作完成后文件被更新。
         """
+        session = session or WriteSession.active_for(filename)
         try:
             # 读取 Excel 数据
-            data = pd.read_excel(filename, sheet_name=sheet_name)
+            data = Tools._read_sheet(filename, sheet_name, session)
         except Exception as e:
             raise ValueError(f"读取 Excel 文件失败: {e}")
 
@@ -109,22 +135,28 @@ class Tools:
         # 按优先级进行排序
         sorted_data = data.sort_values(by=sort_priority).reset_index(drop=True)
 
+        if session is not None:
+            session.stage(sheet_name, sorted_data)
+            print(f"排序结果已暂存到写入会话: {filename}")
+            return
+
         try:
             # 写回 Excel 文件
             with pd.ExcelWriter(filename, mode='a', if_sheet_exists='replace') as writer:
                 sorted_data.to_excel(writer, sheet_name=sheet_name, index=False)
         except Exception as e:
             raise ValueError(f"写入 Excel 文件失败: {e}")
+        finally:
+            workbook_registry.invalidate(filename)
 
         print(f"文件已成功排序并保存: {filename}")
     
     # 如果 sheet 中的某个 column_name 存在于传入的 column_names 列表中，那么替换为 new_column_name 的方法
     @staticmethod
     def replace_column_name(data: pd.DataFrame, column_names: list[str], new_column_name: str) -> pd.DataFrame:
-        for column_name in column_names:
-            if column_name in data.columns:
-                data.rename(columns={column_name: new_column_name}, inplace=True)
-                break
+        column_name = resolve_alias(data.columns, column_names)
+        if column_name is not None:
+            data.rename(columns={column_name: new_column_name}, inplace=True)
         return data
 
     @staticmethod
@@ -162,3 +194,17 @@ class Tools:
             new_file_path (str): 新文件路径
         """
         shutil.copy(file_path, new_file_path)
+
+    @staticmethod
+    def copy_file_if_missing(file_path: str, new_file_path: str) -> None:
+        """
+        新路径不存在时复制文件，已存在时保持不变
+
+        参数:
+            file_path (str): 原始文件路径
+            new_file_path (str): 新文件路径
+        """
+        if os.path.exists(new_file_path):
+            print(f"{new_file_path} 已存在，不复制")
+            return
+        shutil.copy(file_path, new_file_path)
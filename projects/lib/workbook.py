@@ -0,0 +1,449 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from pandas.io.parsers import TextParser
+from lib.sheet_cache import sheet_cache
+
+__all__ = [
+    'RowFilter', 'SheetSchema', 'WorkbookHandle', 'WorkbookRegistry', 'workbook_registry',
+    'resolve_alias', 'apply_pushdown', 'open_readonly_book', 'stream_sheet',
+]
+
+
+@dataclass
+class RowFilter:
+    """
+    读取sheet时下推的行过滤条件
+
+    column 列的值（先经过 transform 处理）属于 values 时保留该行。
+
+    参数:
+        column: 列名
+        values: 允许的取值
+        transform: 比较前对单元格值的处理函数，如去掉城市名中的"市"
+    """
+    column: Hashable
+    values: Iterable
+    transform: Optional[Callable[[Any], Any]] = None
+    _value_set: set = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._value_set = set(self.values)
+
+    def matches(self, value) -> bool:
+        if self.transform is not None:
+            value = self.transform(value)
+        try:
+            return value in self._value_set
+        except TypeError:
+            return False
+
+    def mask(self, series: pd.Series) -> np.ndarray:
+        """对整列求值，transform 只对去重后的取值调用一次"""
+        if self.transform is None:
+            return series.isin(self._value_set).to_numpy()
+        codes, uniques = pd.factorize(series)
+        keep = np.array([self.matches(value) for value in uniques], dtype=bool)
+        result = np.zeros(len(series), dtype=bool)
+        valid = codes >= 0
+        result[valid] = keep[codes[valid]]
+        return result
+
+
+def resolve_alias(columns: Iterable, aliases: Iterable) -> Optional[Hashable]:
+    """
+    返回 aliases 中第一个出现在 columns 里的列名
+
+    参数:
+        columns: 实际的列名
+        aliases: 候选列名（别名），按优先级排列
+
+    返回:
+        匹配到的列名，没有匹配时返回None
+    """
+    columns = set(columns)
+    for alias in aliases:
+        if alias in columns:
+            return alias
+    return None
+
+
+@dataclass
+class SheetSchema:
+    """
+    sheet的表头信息
+
+    参数:
+        sheet_name: sheet名称
+        columns: 列名（与 read_excel 得到的列名一致）
+        dtypes: 根据前 n 行推断的列类型，只探测表头时为空
+    """
+    sheet_name: str
+    columns: List
+    dtypes: Dict[Hashable, Any] = field(default_factory=dict)
+
+    def resolve(self, aliases: Iterable) -> Optional[Hashable]:
+        """返回第一个存在于表头中的别名"""
+        return resolve_alias(self.columns, aliases)
+
+
+def apply_pushdown(data: pd.DataFrame, columns: Optional[List] = None,
+                   row_filters: Optional[List[RowFilter]] = None) -> pd.DataFrame:
+    """
+    在已加载的DataFrame上执行列投影和行过滤
+
+    参数:
+        data (pd.DataFrame): 数据
+        columns (list): 需要保留的列，为None时保留全部列
+        row_filters (list[RowFilter]): 行过滤条件
+
+    返回:
+        pd.DataFrame: 过滤后的新DataFrame
+    """
+    required = list(columns or []) + [row_filter.column for row_filter in row_filters or []]
+    missing = [col for col in dict.fromkeys(required) if col not in data.columns]
+    if missing:
+        raise ValueError(f"以下列在sheet中不存在: {missing}")
+
+    if row_filters:
+        mask = np.ones(len(data), dtype=bool)
+        for row_filter in row_filters:
+            mask &= row_filter.mask(data[row_filter.column])
+        data = data[mask].reset_index(drop=True)
+    if columns is not None:
+        data = data[list(columns)]
+    return data.copy()
+
+
+def _convert_cell(cell):
+    # 与 pandas 的 openpyxl 读取器保持一致的单元格转换规则
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    elif cell.data_type == TYPE_ERROR:
+        return np.nan
+    elif cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+
+def open_readonly_book(file_path: str):
+    """以 pandas 读取xlsx时相同的参数打开只读工作簿"""
+    from openpyxl import load_workbook
+    return load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+
+
+def stream_sheet(file_path: str, sheet_name: str, columns: Optional[List] = None,
+                 row_filters: Optional[List[RowFilter]] = None, max_rows: Optional[int] = None,
+                 book=None) -> pd.DataFrame:
+    """
+    以 openpyxl 只读模式逐行读取sheet，读取过程中完成列投影和行过滤
+
+    不满足过滤条件的行不会进入DataFrame，峰值内存只与保留的数据量有关。
+
+    参数:
+        file_path (str): Excel文件路径
+        sheet_name (str): sheet名称
+        columns (list): 需要保留的列，为None时保留全部列
+        row_filters (list[RowFilter]): 行过滤条件
+        max_rows (int): 最多保留的数据行数，为None时读取全部；0 表示只读表头
+        book: 已打开的只读工作簿，为None时临时打开并在读取后关闭
+
+    返回:
+        pd.DataFrame: 过滤后的数据
+    """
+    row_filters = row_filters or []
+    own_book = book is None
+    if own_book:
+        book = open_readonly_book(file_path)
+    try:
+        sheet = book[sheet_name]
+        sheet.reset_dimensions()
+        rows = sheet.rows
+
+        header_cells = next(rows, None)
+        raw_header = [_convert_cell(cell) for cell in header_cells] if header_cells else []
+        while raw_header and raw_header[-1] == "":
+            raw_header.pop()
+        # 表头的去重和 "Unnamed: n" 命名交给 pandas 处理，保证与 read_excel 一致
+        header = list(TextParser([raw_header], header=0).read().columns) if raw_header else []
+
+        missing = [col for col in dict.fromkeys(list(columns or []) + [f.column for f in row_filters])
+                   if col not in header]
+        if missing:
+            raise ValueError(f"以下列在sheet中不存在: {missing}")
+
+        positions = list(range(len(header))) if columns is None else [header.index(col) for col in columns]
+        filter_positions = [(row_filter, header.index(row_filter.column)) for row_filter in row_filters]
+        width = len(header)
+
+        kept = []
+        for row in rows:
+            if max_rows is not None and len(kept) >= max_rows:
+                break
+            values = [_convert_cell(cell) for cell in row[:width]]
+            if len(values) < width:
+                values.extend([""] * (width - len(values)))
+            if not all(row_filter.matches(values[pos]) for row_filter, pos in filter_positions):
+                continue
+            kept.append([values[pos] for pos in positions])
+    finally:
+        if own_book:
+            book.close()
+
+    # 与 read_excel 一样去掉末尾的空行
+    while kept and all(value == "" for value in kept[-1]):
+        kept.pop()
+    return TextParser([[header[pos] for pos in positions]] + kept, header=0).read()
+
+
+class WorkbookHandle:
+    """
+    单个Excel工作簿的句柄，文件只打开一次，sheet按需解析并缓存
+
+    已经写入列式缓存（见 lib.sheet_cache）的sheet直接从缓存加载，不再打开xlsx。
+
+    参数:
+        file_path (str): Excel文件路径
+        signature (tuple): 打开时文件的 (mtime, size)，用于判断缓存是否失效
+    """
+    def __init__(self, file_path: str, signature: Tuple[int, int]):
+        self.file_path = file_path
+        self.signature = signature
+        self._excel_file = None
+        self._sheets: Dict[str, pd.DataFrame] = {}
+        self._sheet_names: List[str] = None
+        self._schemas: Dict[Tuple[str, int], SheetSchema] = {}
+        self._readonly_book = None
+
+    @property
+    def excel_file(self) -> pd.ExcelFile:
+        if self._excel_file is None:
+            self._excel_file = pd.ExcelFile(self.file_path)
+        return self._excel_file
+
+    @property
+    def sheet_names(self) -> List[str]:
+        if self._sheet_names is None:
+            self._sheet_names = sheet_cache.sheet_names(self.file_path)
+            if self._sheet_names is None:
+                self._sheet_names = self.excel_file.sheet_names
+                sheet_cache.store_sheet_names(self.file_path, self._sheet_names)
+        return self._sheet_names
+
+    def parse(self, sheet_name: str) -> pd.DataFrame:
+        """
+        解析指定sheet，同一个sheet只解析一次
+
+        参数:
+            sheet_name (str): sheet名称
+
+        返回:
+            pd.DataFrame: 缓存中的DataFrame（调用方不应直接修改）
+        """
+        if sheet_name not in self._sheets:
+            if sheet_name not in self.sheet_names:
+                raise ValueError(f"Sheet '{sheet_name}' not found in file")
+            data = sheet_cache.load(self.file_path, sheet_name)
+            if data is None:
+                data = self.excel_file.parse(sheet_name)
+                sheet_cache.store(self.file_path, sheet_name, data)
+            self._sheets[sheet_name] = data
+        return self._sheets[sheet_name]
+
+    def parse_filtered(self, sheet_name: str, columns: Optional[List] = None,
+                       row_filters: Optional[List[RowFilter]] = None) -> pd.DataFrame:
+        """
+        读取sheet并下推列投影和行过滤
+
+        sheet已在内存中时直接过滤；有列式缓存时只加载需要的列；否则以只读模式
+        逐行读取xlsx，过滤掉的行不会被物化。
+
+        参数:
+            sheet_name (str): sheet名称
+            columns (list): 需要保留的列，为None时保留全部列
+            row_filters (list[RowFilter]): 行过滤条件
+
+        返回:
+            pd.DataFrame: 过滤后的新DataFrame
+        """
+        if sheet_name not in self.sheet_names:
+            raise ValueError(f"Sheet '{sheet_name}' not found in file")
+
+        if sheet_name in self._sheets:
+            return apply_pushdown(self._sheets[sheet_name], columns, row_filters)
+
+        needed = None
+        if columns is not None:
+            needed = list(dict.fromkeys(list(columns) + [f.column for f in row_filters or []]))
+        data = sheet_cache.load(self.file_path, sheet_name, columns=needed)
+        if data is not None:
+            return apply_pushdown(data, columns, row_filters)
+        return stream_sheet(self.file_path, sheet_name, columns, row_filters)
+
+    def probe(self, sheet_name: str, n_rows: int = 0) -> SheetSchema:
+        """
+        只读取表头（以及前 n_rows 行用于推断类型），结果按 (sheet, n_rows) 缓存
+
+        参数:
+            sheet_name (str): sheet名称
+            n_rows (int): 用于推断列类型的行数，默认为0即只读表头
+
+        返回:
+            SheetSchema: 表头信息
+        """
+        key = (sheet_name, n_rows)
+        if key in self._schemas:
+            return self._schemas[key]
+        if sheet_name not in self.sheet_names:
+            raise ValueError(f"Sheet '{sheet_name}' not found in file")
+
+        if sheet_name in self._sheets:
+            sample = self._sheets[sheet_name].head(n_rows)
+        else:
+            table = sheet_cache.load_table(self.file_path, sheet_name)
+            if table is not None:
+                # 内存映射的Arrow文件，切片不会读取其余的行
+                sample = sheet_cache.to_pandas(table.slice(0, n_rows))
+            else:
+                if self._readonly_book is None:
+                    self._readonly_book = open_readonly_book(self.file_path)
+                sample = stream_sheet(self.file_path, sheet_name, max_rows=n_rows, book=self._readonly_book)
+
+        schema = SheetSchema(
+            sheet_name=sheet_name,
+            columns=list(sample.columns),
+            dtypes=dict(sample.dtypes) if n_rows > 0 else {},
+        )
+        self._schemas[key] = schema
+        return schema
+
+    def close(self) -> None:
+        if self._excel_file is not None:
+            self._excel_file.close()
+            self._excel_file = None
+        if self._readonly_book is not None:
+            self._readonly_book.close()
+            self._readonly_book = None
+        self._sheets.clear()
+        self._schemas.clear()
+        self._sheet_names = None
+
+
+class WorkbookRegistry:
+    """
+    进程级的工作簿注册表
+
+    同一个文件在进程内只打开一次，各个sheet在第一次读取时解析并缓存。
+    文件的修改时间或大小发生变化时，缓存自动失效并重新打开文件。
+    """
+    def __init__(self):
+        self._handles: Dict[str, WorkbookHandle] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    @staticmethod
+    def _signature(file_path: str) -> Tuple[int, int]:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def open(self, file_path: str) -> WorkbookHandle:
+        """
+        获取文件对应的句柄，文件发生变化时重新打开
+
+        参数:
+            file_path (str): Excel文件路径
+
+        返回:
+            WorkbookHandle: 工作簿句柄
+        """
+        key = self._key(file_path)
+        signature = self._signature(key)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle.signature != signature:
+                handle.close()
+                handle = None
+            if handle is None:
+                handle = WorkbookHandle(key, signature)
+                self._handles[key] = handle
+            return handle
+
+    def sheet_names(self, file_path: str) -> List[str]:
+        """返回工作簿中的所有sheet名称"""
+        with self._lock:
+            return self.open(file_path).sheet_names
+
+    def read_sheet(self, file_path: str, sheet_name: str, copy: bool = True, columns: Optional[List] = None,
+                   row_filters: Optional[List[RowFilter]] = None) -> pd.DataFrame:
+        """
+        读取指定sheet的数据
+
+        参数:
+            file_path (str): Excel文件路径
+            sheet_name (str): sheet名称
+            copy (bool): 是否返回副本，默认为True；只读场景可以传False避免复制
+            columns (list): 列投影，只返回这些列
+            row_filters (list[RowFilter]): 行过滤条件，读取时即过滤
+
+        返回:
+            pd.DataFrame: sheet数据
+        """
+        if columns is not None or row_filters:
+            with self._lock:
+                return self.open(file_path).parse_filtered(sheet_name, columns, row_filters)
+
+        with self._lock:
+            data = self.open(file_path).parse(sheet_name)
+        return data.copy() if copy else data
+
+    def probe_schema(self, file_path: str, sheet_name: str, n_rows: int = 0) -> SheetSchema:
+        """
+        探测sheet的表头，不解析整个sheet
+
+        参数:
+            file_path (str): Excel文件路径
+            sheet_name (str): sheet名称
+            n_rows (int): 额外读取用于推断列类型的行数
+
+        返回:
+            SheetSchema: 表头信息
+        """
+        with self._lock:
+            return self.open(file_path).probe(sheet_name, n_rows)
+
+    def probe_workbook(self, file_path: str, n_rows: int = 0) -> Dict[str, SheetSchema]:
+        """探测工作簿中所有sheet的表头"""
+        with self._lock:
+            handle = self.open(file_path)
+            return {sheet_name: handle.probe(sheet_name, n_rows) for sheet_name in handle.sheet_names}
+
+    def invalidate(self, file_path: str = None) -> None:
+        """
+        使缓存失效
+
+        参数:
+            file_path (str): 需要失效的文件路径，为None时清空所有缓存
+        """
+        with self._lock:
+            if file_path is None:
+                keys = list(self._handles.keys())
+            else:
+                keys = [self._key(file_path)]
+            for key in keys:
+                handle = self._handles.pop(key, None)
+                if handle is not None:
+                    handle.close()
+
+
+workbook_registry = WorkbookRegistry()
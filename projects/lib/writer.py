@@ -1,3 +1,153 @@
+import os
+import shutil
+import threading
+import pandas as pd
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from lib.workbook import workbook_registry
+
 class ExcelWriter:
     def __init__(self, file_path):
         self.file_path = file_path
+
+
+class WriteSession:
+    """
+    工作簿写入会话，收集多个sheet的输出后一次性写入磁盘
+
+    会话期间 DataCleaner.close_file_and_save、Tools.clean_column_data、
+    Tools.rearrange_data 等写操作只把结果暂存在内存中，提交时整个工作簿只
+    序列化一次，先写入同目录下的临时文件再重命名覆盖原文件，中途失败不会留下
+    写了一半的工作簿。
+
+    用法:
+        with WriteSession(file_path) as session:
+            cleaner = DataCleaner(file_path, sheet_name='Sheet1')
+            ...
+            cleaner.close_file_and_save()   # 暂存到 session
+        # 正常退出 with 时提交，抛出异常时丢弃暂存的数据
+
+    参数:
+        file_path (str): 目标Excel文件路径
+    """
+    _active: Dict[str, 'WriteSession'] = {}
+    _lock = threading.Lock()
+    # 延迟提交时收集暂存数据的字典：文件绝对路径 -> {sheet名称: (数据, 是否写入索引)}
+    _outbox: Optional[Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]]] = None
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._key = os.path.abspath(file_path)
+        self.staged: Dict[str, Tuple[pd.DataFrame, bool]] = {}
+
+    @classmethod
+    def active_for(cls, file_path: str) -> Optional['WriteSession']:
+        """
+        返回该文件当前处于激活状态的会话
+
+        参数:
+            file_path (str): Excel文件路径
+
+        返回:
+            WriteSession: 激活的会话，没有时返回None
+        """
+        with cls._lock:
+            return cls._active.get(os.path.abspath(file_path))
+
+    @classmethod
+    @contextmanager
+    def deferred(cls) -> Iterator[Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]]]:
+        """
+        延迟提交：上下文中所有会话的 commit 不写入磁盘，暂存的sheet按文件收集到
+        返回的字典中，由调用方统一写入（例如流水线中工作进程把结果交给主进程写入）
+
+        返回:
+            dict: 文件绝对路径 -> {sheet名称: (数据, 是否写入索引)}
+        """
+        outbox: Dict[str, Dict[str, Tuple[pd.DataFrame, bool]]] = {}
+        with cls._lock:
+            previous, cls._outbox = cls._outbox, outbox
+        try:
+            yield outbox
+        finally:
+            with cls._lock:
+                cls._outbox = previous
+
+    def stage(self, sheet_name: str, data: pd.DataFrame, index: bool = False) -> None:
+        """
+        暂存一个sheet的输出，同名sheet后暂存的覆盖先暂存的
+
+        参数:
+            sheet_name (str): sheet名称
+            data (pd.DataFrame): 需要写入的数据
+            index (bool): 是否写入索引，默认为False
+        """
+        self.staged[sheet_name] = (data.copy(), index)
+
+    def has_sheet(self, sheet_name: str) -> bool:
+        return sheet_name in self.staged
+
+    def read_sheet(self, sheet_name: str) -> pd.DataFrame:
+        """返回暂存的sheet数据的副本"""
+        if sheet_name not in self.staged:
+            raise ValueError(f"Sheet '{sheet_name}' is not staged in this session")
+        return self.staged[sheet_name][0].copy()
+
+    def discard(self) -> None:
+        """丢弃所有暂存的数据"""
+        self.staged.clear()
+
+    def commit(self) -> None:
+        """
+        将所有暂存的sheet一次性写入工作簿
+
+        已存在的工作簿中未暂存的sheet保持不变；写入过程先生成临时文件，
+        成功后通过 os.replace 原子替换目标文件。处于 deferred() 上下文中时
+        只把暂存的sheet交给调用方，不写入磁盘。
+        """
+        if not self.staged:
+            return
+
+        outbox = WriteSession._outbox
+        if outbox is not None:
+            outbox.setdefault(self._key, {}).update(self.staged)
+            print(f"已暂存 {len(self.staged)} 个sheet，等待写入 {self.file_path}: {list(self.staged.keys())}")
+            self.staged.clear()
+            return
+
+        directory, file_name = os.path.split(self._key)
+        base, ext = os.path.splitext(file_name)
+        # openpyxl 根据扩展名判断文件类型，临时文件保留原扩展名
+        tmp_path = os.path.join(directory, f".~{base}.{os.getpid()}.tmp{ext}")
+        try:
+            if os.path.exists(self._key):
+                shutil.copy2(self._key, tmp_path)
+                writer = pd.ExcelWriter(tmp_path, engine='openpyxl', mode='a', if_sheet_exists='replace')
+            else:
+                writer = pd.ExcelWriter(tmp_path, engine='openpyxl', mode='w')
+            with writer:
+                for sheet_name, (data, index) in self.staged.items():
+                    data.to_excel(writer, sheet_name=sheet_name, index=index)
+            os.replace(tmp_path, self._key)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            workbook_registry.invalidate(self._key)
+
+        print(f"已提交 {len(self.staged)} 个sheet到 {self.file_path}: {list(self.staged.keys())}")
+        self.staged.clear()
+
+    def __enter__(self) -> 'WriteSession':
+        with self._lock:
+            if self._key in self._active:
+                raise ValueError(f"文件 '{self.file_path}' 已经存在激活的写入会话")
+            self._active[self._key] = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        with self._lock:
+            self._active.pop(self._key, None)
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
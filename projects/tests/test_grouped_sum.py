@@ -0,0 +1,40 @@
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.land import GroupedSum
+
+
+def make_data():
+    # 数量级相差很大、正负混合的值，逐个相加时结果依赖顺序
+    rng = np.random.default_rng(0)
+    count = 3000
+    values = rng.normal(size=count) * 10.0 ** rng.integers(-8, 17, size=count)
+    return pd.DataFrame({'市': rng.choice(['长沙', '株洲', '湘潭'], count), '值': values})
+
+
+def test_sums_are_correctly_rounded():
+    data = make_data()
+    cube = GroupedSum(['市'], ['值'])
+    cube.add(data)
+    result = cube.result()
+    for city, group in data.groupby('市'):
+        assert result.loc[city, '值'] == math.fsum(group['值'])
+
+
+def test_result_independent_of_chunks():
+    data = make_data()
+    results = []
+    for size, merge_rows in ((3000, 1), (7, 1), (101, 50)):
+        cube = GroupedSum(['市'], ['值'], merge_rows=merge_rows)
+        # 分块倒序到达
+        for start in reversed(range(0, len(data), size)):
+            cube.add(data.iloc[start:start + size])
+        results.append(cube.result())
+    assert results[0].equals(results[1])
+    assert results[0].equals(results[2])
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.pipeline import Pipeline, Step
+from lib.step_cache import StepCache
+from lib.tools import Tools
+from lib.writer import WriteSession
+
+
+def double_sheet(input_file, output_file, sheet):
+    data = pd.read_excel(input_file, sheet_name=sheet)
+    WriteSession.active_for(output_file).stage(sheet, data * 2)
+
+
+def make_pipeline(tmp_path):
+    # 原始工作簿：两个清理的sheet和一个不清理的sheet
+    input_file = str(tmp_path / 'input.xlsx')
+    output_file = str(tmp_path / 'output.xlsx')
+    with pd.ExcelWriter(input_file) as writer:
+        for sheet, value in (('a', 1), ('b', 10), ('raw', 100)):
+            pd.DataFrame({'x': [value]}).to_excel(writer, sheet_name=sheet, index=False)
+    steps = [Step('workbook', Tools.copy_file_if_missing, (input_file, output_file),
+                  inputs=[input_file], outputs=[output_file], cache=False)]
+    steps += [Step(sheet, double_sheet, (input_file, output_file, sheet),
+                   inputs=[(input_file, sheet)], outputs=[(output_file, sheet)]) for sheet in ('a', 'b')]
+    return Pipeline(steps), output_file
+
+
+def read_values(output_file):
+    return {sheet: data['x'].tolist() for sheet, data in pd.read_excel(output_file, sheet_name=None).items()}
+
+
+def test_single_target_keeps_other_sheets(tmp_path):
+    pipeline, output_file = make_pipeline(tmp_path)
+    cache = StepCache(str(tmp_path / 'cache'))
+    pipeline.run(workers=1, cache=cache)
+    assert read_values(output_file) == {'a': [2], 'b': [20], 'raw': [100]}
+
+    # 只运行一个sheet的步骤时，工作簿已存在不会重新复制，其他sheet保持清理后的数据
+    assert pipeline.order(['a']) == ['workbook', 'a']
+    pipeline.run(['a'], workers=1, cache=cache)
+    assert read_values(output_file) == {'a': [2], 'b': [20], 'raw': [100]}
+
+
+def test_single_target_copies_missing_workbook(tmp_path):
+    pipeline, output_file = make_pipeline(tmp_path)
+    pipeline.run(['b'], workers=1)
+    assert read_values(output_file) == {'a': [1], 'b': [20], 'raw': [100]}
@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.pipeline import Step
+from lib.step_cache import StepCache
+
+
+def double(value):
+    return value * 2
+
+
+def make_cache(tmp_path):
+    # 独立的项目目录：入口脚本、库模块和sheet规则各一个
+    root = tmp_path / 'project'
+    (root / 'lib').mkdir(parents=True)
+    (root / 'main.py').write_text('STEPS = []\n', encoding='utf-8')
+    (root / 'lib' / 'helper.py').write_text('SCALE = 1\n', encoding='utf-8')
+    (root / 'sheet_specs.toml').write_text('[[sheet]]\n', encoding='utf-8')
+    return root, StepCache(str(tmp_path / 'cache'), code_root=str(root))
+
+
+def test_unchanged_code_restores_entry(tmp_path):
+    _, cache = make_cache(tmp_path)
+    step = Step('double', double, (3,))
+    fingerprint = cache.fingerprint(step)
+    assert cache.store(step, fingerprint, {})
+    assert cache.fingerprint(step) == fingerprint
+    assert cache.restore(step, fingerprint) == {}
+
+
+def test_editing_lib_module_invalidates_entry(tmp_path):
+    root, cache = make_cache(tmp_path)
+    step = Step('double', double, (3,))
+    fingerprint = cache.fingerprint(step)
+    cache.store(step, fingerprint, {})
+
+    (root / 'lib' / 'helper.py').write_text('SCALE = 10\n', encoding='utf-8')
+    changed = cache.fingerprint(step)
+    assert changed != fingerprint
+    assert cache.restore(step, changed) is None
+
+
+def test_editing_sheet_specs_invalidates_entry(tmp_path):
+    root, cache = make_cache(tmp_path)
+    step = Step('double', double, (3,))
+    fingerprint = cache.fingerprint(step)
+    cache.store(step, fingerprint, {})
+
+    (root / 'sheet_specs.toml').write_text('[[sheet]]\nname = "x"\n', encoding='utf-8')
+    assert cache.restore(step, cache.fingerprint(step)) is None
@@ -8,14 +8,14 @@ class Workflow:
 
         if not is_long_format:
             self.data_cleaner = DataCleaner(
-                file_path=self.file_name,
+                self.file_name,
                 sheet_name=self.sheet_name,
                 is_long_format=is_long_format,
                 long_format_params=long_format_params
             )
         else:
             self.data_cleaner = DataCleaner(
-                file_path=self.file_name,
+                self.file_name,
                 sheet_name=self.sheet_name,
             )
 
@@ -33,7 +33,7 @@ class Workflow:
         )
 
         if is_missing_data:
-            self.process_missing_data(y_columns, 'city', 'year')
+            self.data_cleaner.interpolate_many(y_columns, 'city', 'year')
     
     def close_and_save(self):
         self.data_cleaner.close_file_and_save()